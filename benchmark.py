@@ -0,0 +1,633 @@
+"""!
+Micro-benchmarks of the environment.
+
+Usage:
+    python3 benchmark.py physics
+    python3 benchmark.py reset
+    python3 benchmark.py repeat
+    python3 benchmark.py integrators
+    python3 benchmark.py snapshot
+    python3 benchmark.py imports
+    python3 benchmark.py render
+    python3 benchmark.py pixels
+    python3 benchmark.py actions
+    python3 benchmark.py learn
+    python3 benchmark.py learner
+    python3 benchmark.py inference
+"""
+
+import argparse
+import math
+import random
+import subprocess
+import sys
+import time
+
+
+def measure(fn, n):
+    """!
+    Measures how many times per second a function can be called.
+
+    @param fn (callable): Function to call
+    @param n (int): Number of calls
+
+    @return float: calls per second
+    """
+
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+
+    return n / (time.perf_counter() - start)
+
+
+class _ReferenceVector():
+    """!
+    Vector as it was before the physics kernel was made allocation-free,
+    kept as the baseline of benchmark_physics.
+    """
+
+    def __init__(self, x=0, y=1):
+        self.x = x
+        self.y = y
+
+        self.normalize()
+
+    def rotate_around_z(self, angle):
+        temp_x = self.x * math.cos(angle) - self.y * math.sin(angle)
+        self.y = self.x * math.sin(angle) + self.y * math.cos(angle)
+
+        self.x = temp_x
+
+        self.normalize()
+
+    def get_component_along_vector(self, vector):
+        return self.x * vector.x + self.y * vector.y
+
+    def get_rotated_vectors(self):
+        along = _ReferenceVector(self.x, self.y)
+        side = _ReferenceVector(self.x, self.y)
+        side.rotate_around_z(math.pi / 2)
+
+        return along, side
+
+    def normalize(self):
+        length = math.sqrt(self.x * self.x + self.y * self.y)
+
+        if length > 0:
+            self.x /= length
+            self.y /= length
+
+
+class _ReferenceTVC(_ReferenceVector):
+    """!
+    TVC mount as it was before its rotations were precomputed.
+    """
+
+    def __init__(self, max_thrust, tvc_range):
+        super(_ReferenceTVC, self).__init__()
+
+        self.max_thrust = max_thrust
+        self.tvc_range = tvc_range
+        self.current_thrust = max_thrust
+        self.level = 0
+
+    def set_rotation_left(self):
+        if self.level > 0.1:
+            self.rotate_around_z(-self.tvc_range * 2)
+            self.level -= self.tvc_range * 2
+        elif self.level > -0.1:
+            self.rotate_around_z(-self.tvc_range)
+            self.level -= self.tvc_range
+
+    def set_rotation_right(self):
+        if self.level < -0.1:
+            self.rotate_around_z(self.tvc_range * 2)
+            self.level += self.tvc_range * 2
+        elif self.level < 0.1:
+            self.rotate_around_z(self.tvc_range)
+            self.level += self.tvc_range
+
+    def set_rotation_middle(self):
+        if self.level > 0.1:
+            self.rotate_around_z(-self.tvc_range)
+            self.level -= self.tvc_range
+        elif self.level < -0.1:
+            self.rotate_around_z(self.tvc_range)
+            self.level += self.tvc_range
+
+
+class _ReferenceRocket(_ReferenceVector):
+    """!
+    Rocket as it was before its physics step was made allocation-free.
+    """
+
+    def __init__(self, y, weight, moment_of_inertia, center_of_mass):
+        super(_ReferenceRocket, self).__init__()
+
+        self.position_x = 0
+        self.position_y = y
+        self.velocity_x = 0
+        self.velocity_y = 0
+        self.angular_velocity = 0
+
+        self.weight = weight
+        self.moment_of_inertia = moment_of_inertia
+        self.center_of_mass = center_of_mass
+
+    def update_position(self, tvc):
+        from environment.constants import GRAVITY, TIMESTEP
+
+        along, side = self.get_rotated_vectors()
+
+        push_force = tvc.current_thrust * tvc.get_component_along_vector(along)
+        rotate_force = tvc.current_thrust * \
+            tvc.get_component_along_vector(side)
+
+        self.velocity_x += TIMESTEP * (along.x * push_force) / self.weight
+
+        self.velocity_y -= TIMESTEP * GRAVITY
+        self.velocity_y += TIMESTEP * (along.y * push_force) / self.weight
+
+        self.position_x += TIMESTEP * self.velocity_x
+        self.position_y += TIMESTEP * self.velocity_y
+
+        angular_acceleration = self.center_of_mass * \
+            rotate_force / self.moment_of_inertia
+
+        angular_acceleration = round(angular_acceleration, 5)
+
+        self.angular_velocity += TIMESTEP * angular_acceleration
+
+        self.rotate_around_z(TIMESTEP * self.angular_velocity)
+        tvc.rotate_around_z(TIMESTEP * self.angular_velocity)
+
+
+def benchmark_physics(n):
+    """!
+    Compares the throughput of the physics kernel with the kernel
+    it replaced, and of stepping rockets one by one with a VectorEnvironment.
+
+    @param n (int): Number of steps to measure
+    """
+
+    from environment.constants import WEIGHT, MOMENT_OF_INERTIA, CENTER_OF_MASS, MAX_THRUST, MAX_ROTATION
+    from environment.environment import Environment
+    from environment.rocket import Rocket
+    from environment.tvc import TVC
+    from environment.vector_environment import VectorEnvironment
+    import numpy as np
+
+    def kernel(rocket, tvc):
+        turns = [tvc.set_rotation_left, tvc.set_rotation_middle,
+                 tvc.set_rotation_right]
+
+        def physics_step():
+            random.choice(turns)()
+            rocket.update_position(tvc)
+
+        return physics_step
+
+    tvc = TVC(MAX_THRUST, MAX_ROTATION)
+    tvc.set_max_thrust()
+    new_kernel = kernel(Rocket(0, 1e9, WEIGHT, MOMENT_OF_INERTIA, CENTER_OF_MASS), tvc)
+
+    reference_kernel = kernel(_ReferenceRocket(1e9, WEIGHT, MOMENT_OF_INERTIA, CENTER_OF_MASS),
+                              _ReferenceTVC(MAX_THRUST, MAX_ROTATION))
+
+    env = Environment()
+    env.curriculum.set_random_height(1e6, 1e6)
+    env.curriculum.enable_random_height()
+    env.reset()
+
+    def env_step():
+        env.step(random.randint(0, 2))
+
+    batch = 1024
+    vector_env = VectorEnvironment(batch)
+    vector_env.curriculum.set_random_height(1e6, 1e6)
+    vector_env.curriculum.enable_random_height()
+    vector_env.reset()
+    actions = np.random.randint(0, 3, size=batch)
+
+    def vector_step():
+        vector_env.step(actions)
+
+    rows = [("Physics kernel", "previous classes", measure(reference_kernel, n), "allocation-free", measure(new_kernel, n)),
+            ("Rocket steps", "Environment.step", measure(env_step, n),
+             f"VectorEnvironment({batch})", batch * measure(vector_step, max(n // batch, 10)))]
+
+    print(f"{'':>15} {'baseline':>30} {'new':>34} {'speedup':>8}")
+
+    for name, baseline_name, baseline, new_name, new in rows:
+        print(f"{name:>15} {baseline_name:>18} {baseline:9.0f}/s {new_name:>22} {new:9.0f}/s {new / baseline:7.2f}x")
+
+
+def benchmark_reset(n):
+    """!
+    Measures the throughput of environment resets.
+
+    @param n (int): Number of resets to measure
+    """
+
+    from environment.environment import Environment
+
+    env = Environment()
+    env.curriculum.enable_random_starting_rotation()
+
+    print(f"Environment.reset: {measure(env.reset, n):12.0f} resets/s")
+
+
+def benchmark_repeat(n):
+    """!
+    Measures the collection throughput, with the agent choosing
+    the actions, for different numbers of repeated timesteps.
+
+    @param n (int): Number of simulated timesteps to measure
+    """
+
+    from environment.environment import Environment
+    from network import Agent
+
+    env = Environment()
+    env.curriculum.set_random_height(1e6, 1e6)
+    env.curriculum.enable_random_height()
+
+    agent = Agent(gamma=0.99, epsilon=0, lr=0.001,
+                  input_dims=[5], batch_size=64, n_actions=4)
+
+    for repeat in [1, 2, 4, 8]:
+        observation = env.reset()
+
+        def collect():
+            nonlocal observation
+            action = agent.choose_action(observation)
+            observation, _, _, _ = env.step(action, repeat=repeat)
+
+        decisions = measure(collect, n // repeat)
+        print(
+            f"Repeat {repeat}: {decisions:10.0f} decisions/s {decisions * repeat:10.0f} steps/s")
+
+
+def benchmark_integrators(n):
+    """!
+    Compares the accuracy and the throughput of the integrators
+    against a high-resolution reference flight.
+
+    @param n (int): Number of control periods the flight consists of
+    """
+
+    from environment.constants import WEIGHT, MOMENT_OF_INERTIA, CENTER_OF_MASS, MAX_THRUST, MAX_ROTATION, TIMESTEP, Integrator, LogLevel
+    from environment.rocket import Rocket
+    from environment.tvc import TVC
+
+    # Actions are held for 0.1 s, which is a multiple of every timestep below
+    period = 0.1
+    schedule = [random.randint(0, 3) for _ in range(n)]
+
+    def fly(dt, substeps, integrator):
+        rocket = Rocket(0, 0, WEIGHT, MOMENT_OF_INERTIA,
+                        CENTER_OF_MASS, log_level=LogLevel.OFF)
+        tvc = TVC(MAX_THRUST, MAX_ROTATION)
+
+        actions = [tvc.set_rotation_left, tvc.set_rotation_middle,
+                   tvc.set_rotation_right]
+
+        steps = round(period / dt) * substeps
+
+        start = time.perf_counter()
+        for action in schedule:
+            if action < len(actions):
+                actions[action]()
+                tvc.set_max_thrust()
+            else:
+                tvc.set_min_thrust()
+
+            for _ in range(steps):
+                rocket.update_position(tvc, dt / substeps, integrator)
+
+        return rocket, time.perf_counter() - start
+
+    reference, _ = fly(period, 1000, Integrator.RK4)
+
+    print(f"{'Integrator':>20} {'dt (s)':>8} {'substeps':>8} {'position error (m)':>20} {'simulated s/s':>14}")
+
+    for dt, substeps, integrator in [(TIMESTEP, 1, Integrator.SEMI_IMPLICIT_EULER),
+                                     (TIMESTEP, 1, Integrator.RK4),
+                                     (0.05, 1, Integrator.SEMI_IMPLICIT_EULER),
+                                     (0.05, 1, Integrator.RK4),
+                                     (0.1, 1, Integrator.SEMI_IMPLICIT_EULER),
+                                     (0.1, 5, Integrator.SEMI_IMPLICIT_EULER),
+                                     (0.1, 1, Integrator.RK4),
+                                     (0.1, 2, Integrator.RK4)]:
+        rocket, elapsed = fly(dt, substeps, integrator)
+        error = math.hypot(rocket.position_x - reference.position_x,
+                           rocket.position_y - reference.position_y)
+
+        print(
+            f"{integrator.name:>20} {dt:8.2f} {substeps:8d} {error:20.6f} {n * period / elapsed:14.0f}")
+
+
+def benchmark_snapshot(n):
+    """!
+    Measures how fast the simulation can be branched,
+    compared to copying the whole environment.
+
+    @param n (int): Number of branches to measure
+    """
+
+    import copy
+    import numpy as np
+    from environment.environment import Environment
+    from environment.vector_environment import VectorEnvironment
+
+    env = Environment()
+    for _ in range(100):
+        env.step(random.randint(0, 2))
+
+    snapshot = env.get_state_snapshot()
+
+    def deep_copy():
+        copy.deepcopy(env)
+
+    def branch():
+        env.restore_state_snapshot(env.get_state_snapshot())
+
+    print(f"copy.deepcopy:              {measure(deep_copy, max(n // 100, 1)):12.0f} branches/s")
+    print(f"get/restore_state_snapshot: {measure(branch, n):12.0f} branches/s")
+
+    batch = 256
+    vector_env = VectorEnvironment(batch, auto_reset=False)
+    actions = np.random.randint(0, 4, size=batch)
+
+    def branch_batch():
+        vector_env.restore_state_snapshot(snapshot.state)
+        vector_env.step(actions)
+
+    print(
+        f"Batched restore and step:   {measure(branch_batch, max(n // batch, 1)) * batch:12.0f} branches/s")
+
+
+def benchmark_imports(n):
+    """!
+    Measures how long a freshly spawned worker takes to import
+    the environment, compared to the modules used for rendering and plotting.
+
+    @param n (int): Number of interpreters to spawn per measurement
+    """
+
+    script = ("import sys, time\n"
+              "start = time.perf_counter()\n"
+              "import {}\n"
+              "elapsed = time.perf_counter() - start\n"
+              "heavy = [m for m in ('cv2', 'matplotlib', 'pandas') if m in sys.modules]\n"
+              "print(elapsed, ','.join(heavy) or '-')")
+
+    print(f"{'Import':>30} {'time (ms)':>10} {'heavy modules loaded':>24}")
+
+    for module in ["environment.environment", "environment.pool", "environment.renderer",
+                   "environment.dashboard", "train"]:
+        times = []
+        for _ in range(n):
+            output = subprocess.run([sys.executable, "-c", script.format(module)],
+                                    capture_output=True, text=True, check=True).stdout.split()
+            times.append(float(output[0]))
+
+        print(f"{module:>30} {1000 * min(times):10.1f} {output[1]:>24}")
+
+
+def benchmark_render(n):
+    """!
+    Measures the throughput of rendering to an array,
+    with the rocket moving and turning between the frames.
+
+    @param n (int): Number of frames to measure
+    """
+
+    from environment.environment import Environment
+
+    env = Environment()
+    env.curriculum.enable_turn()
+    env.curriculum.set_random_height(5, 5)
+    env.curriculum.enable_random_height()
+    env.reset()
+
+    def frame():
+        _, _, done, _ = env.step(random.randint(0, 2))
+        if done:
+            env.reset()
+        env.render(mode="rgb_array")
+
+    print(f"Environment.render: {measure(frame, n):12.0f} frames/s")
+
+
+def benchmark_pixels(n):
+    """!
+    Measures the collection throughput of the vectorized environment
+    with pixel observations, compared to state observations.
+
+    @param n (int): Number of environment steps to measure per batch size
+    """
+
+    import numpy as np
+    from environment.vector_environment import VectorEnvironment
+
+    for num_envs in [1, 16, 64, 256, 1024]:
+        rates = []
+        for pixels in [False, True]:
+            env = VectorEnvironment(num_envs, pixels=pixels)
+            env.curriculum.enable_turn()
+            env.curriculum.enable_random_starting_rotation()
+            observations = env.reset(seed=0)
+
+            def collect():
+                env.step(np.random.randint(0, 4, size=num_envs), out=observations)
+
+            # Filling the cache of scaled sprites
+            for _ in range(20):
+                collect()
+
+            rates.append(measure(collect, max(n // num_envs, 1)) * num_envs)
+
+        print(
+            f"{num_envs:5d} environments: states {rates[0]:10.0f} steps/s, 84x84 pixels {rates[1]:10.0f} steps/s")
+
+
+def benchmark_actions(n):
+    """!
+    Measures the cost of choosing the actions of a batch of environments,
+    one observation at a time and with a single batched call.
+
+    @param n (int): Number of actions to measure per batch size
+    """
+
+    import numpy as np
+    from environment.constants import Exploration
+    from network import Agent
+
+    for exploration in [Exploration.EPSILON_GREEDY, Exploration.SOFTMAX]:
+        agent = Agent(gamma=0.99, epsilon=0.5, lr=0.001, input_dims=[5],
+                      batch_size=64, n_actions=4, exploration=exploration)
+
+        for num_envs in [1, 16, 64, 256, 1024]:
+            observations = np.random.randn(
+                num_envs, 5).astype(np.float32)
+
+            def one_by_one():
+                for observation in observations:
+                    agent.choose_action(observation)
+
+            def batched():
+                agent.choose_actions(observations)
+
+            repeats = max(n // num_envs, 1)
+            loop = 1e6 / measure(one_by_one, max(repeats // 10, 1))
+            batch = 1e6 / measure(batched, repeats)
+
+            print(
+                f"{exploration.name:>15} {num_envs:5d} environments: one by one {loop:10.1f} us/step, batched {batch:8.1f} us/step")
+
+
+def benchmark_learn(n):
+    """!
+    Measures the throughput of storing transitions and of the network
+    updates sampled from a full replay buffer.
+
+    @param n (int): Number of updates to measure
+    """
+
+    import numpy as np
+    from network import Agent
+
+    for prioritized in [False, True]:
+        agent = Agent(gamma=0.99, epsilon=0, lr=0.001, input_dims=[5],
+                      batch_size=64, n_actions=4, prioritized=prioritized)
+
+        states = np.random.randn(agent.buffer_size + 1, 5).astype(np.float32)
+        i = 0
+
+        def store():
+            nonlocal i
+            agent.store_transition(
+                states[i], i % 4, 0.1, states[i + 1], i % 100 == 0)
+            i += 1
+
+        name = "prioritized" if prioritized else "uniform"
+
+        print(f"{name:>12} Agent.store_transition: {measure(store, agent.buffer_size):12.0f} transitions/s")
+        print(f"{name:>12} Agent.learn:            {measure(agent.learn, n):12.0f} updates/s")
+
+
+def benchmark_learner(n):
+    """!
+    Measures the throughput of the training loop, stepping the environment
+    and updating the network one after the other or on separate threads.
+
+    @param n (int): Number of environment steps to measure
+    """
+
+    import numpy as np
+    from learner import AsyncLearner
+    from train import make_environment, make_agent, learn
+
+    for asynchronous in [False, True]:
+        env = make_environment(False, False)
+        agent = make_agent(False)
+        learner = AsyncLearner(agent) if asynchronous else None
+
+        observation = env.reset(seed=0)
+
+        def collect():
+            nonlocal observation
+            action = agent.choose_action(observation)
+            new_observation, reward, done, _ = env.step(action)
+            agent.store_transition(
+                observation, action, reward, new_observation, done)
+            learn(agent, learner)
+            observation = env.reset() if done else new_observation
+
+        name = "asynchronous" if asynchronous else "synchronous"
+
+        print(f"{name:>12} training loop: {measure(collect, n):12.0f} steps/s")
+
+        if learner is not None:
+            learner.close()
+            print(f"{name:>12} updates made:  {learner.updates:12d}")
+
+
+def benchmark_inference(n):
+    """!
+    Measures the latency of choosing actions with QNetwork and with the NumPy inference.
+    Their outputs are compared by tests/test_inference.py.
+
+    @param n (int): Number of actions to choose
+    """
+
+    import numpy as np
+    import torch as T
+    from inference import NumpyQNetwork, export
+    from network import QNetwork
+
+    network = QNetwork(lr=0.001, input_dims=[5], layer1_dims=32, n_actions=4)
+    numpy_network = NumpyQNetwork(export(network.state_dict()))
+
+    # Scaled like the observations of the environment
+    states = (np.random.randn(1024, 5) * [5, 10, 3, 1, 0.5]).astype(np.float32)
+
+    observation = states[0]
+    batch = states[:1024]
+
+    def torch_single():
+        with T.no_grad():
+            T.argmax(network.feed_forward(
+                T.from_numpy(observation).unsqueeze(0))).item()
+
+    def torch_batch():
+        with T.no_grad():
+            T.argmax(network.feed_forward(T.from_numpy(batch)), dim=1).numpy()
+
+    for name, fn, count in [("torch, one observation", torch_single, n),
+                            ("numpy, one observation", lambda: numpy_network.choose_action(observation), n),
+                            ("torch, 1024 observations", torch_batch, n // 100),
+                            ("numpy, 1024 observations", lambda: numpy_network.choose_actions(batch), n // 100)]:
+        print(f"{name:>25}: {1e6 / measure(fn, count):8.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog='Rocket Landing - Benchmarks')
+
+    parser.add_argument('benchmark', choices=["physics", "reset", "repeat", "integrators", "snapshot", "imports", "render", "pixels", "actions", "learn", "learner", "inference"],
+                        help="Benchmark to run")
+    parser.add_argument('-n', type=int,
+                        help="Number of iterations")
+
+    args = parser.parse_args()
+
+    if args.n is None:
+        args.n = {"integrators": 100, "imports": 10, "render": 1000, "learn": 5000, "learner": 20000}.get(args.benchmark, 100000)
+
+    if args.benchmark == "physics":
+        benchmark_physics(args.n)
+    elif args.benchmark == "reset":
+        benchmark_reset(args.n)
+    elif args.benchmark == "repeat":
+        benchmark_repeat(args.n)
+    elif args.benchmark == "integrators":
+        benchmark_integrators(args.n)
+    elif args.benchmark == "snapshot":
+        benchmark_snapshot(args.n)
+    elif args.benchmark == "imports":
+        benchmark_imports(args.n)
+    elif args.benchmark == "render":
+        benchmark_render(args.n)
+    elif args.benchmark == "pixels":
+        benchmark_pixels(args.n)
+    elif args.benchmark == "actions":
+        benchmark_actions(args.n)
+    elif args.benchmark == "learn":
+        benchmark_learn(args.n)
+    elif args.benchmark == "learner":
+        benchmark_learner(args.n)
+    elif args.benchmark == "inference":
+        benchmark_inference(args.n)
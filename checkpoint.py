@@ -0,0 +1,229 @@
+import contextlib
+import copy
+import glob
+import os
+import queue
+import random
+import re
+import threading
+import numpy as np
+import torch as T
+
+
+class Checkpointer():
+    """!
+    Saves the complete state of the training, so that it can be resumed exactly:
+    the agent with its optimizer, exploration rate and replay buffer,
+    the curriculum and generator of the environment, and the global generators.
+    The training loop only copies the state. It is written by a background
+    thread to a temporary file, which then replaces the checkpoint at once,
+    so a checkpoint is never left half written. Only the newest ones are kept.
+    """
+
+    def __init__(self, directory=os.path.join("models", "checkpoints"), keep=3):
+        """!
+        Starts the writing thread.
+
+        @param directory (string): Directory the checkpoints are saved to
+        @param keep (int): Number of newest checkpoints kept
+        """
+
+        self.directory = directory
+        self.keep = keep
+
+        self.error = None
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.__queue = queue.Queue()
+        self.__thread = threading.Thread(target=self.__write, daemon=True)
+        self.__thread.start()
+
+        self.closed = False
+
+    def save(self, episode, agent, env=None, extra=None, lock=None):
+        """!
+        Copies the state of the training and queues it for writing.
+
+        @param episode (int): Last finished episode
+        @param agent (Agent): Trained agent
+        @param env (Environment): Training environment
+        @param extra (dict): Other state of the training loop, e.g. lists of scores.
+                             Its values are copied one level deep.
+        @param lock (Lock): Held while the state is copied, e.g. the lock of an AsyncLearner
+        """
+
+        self.__raise()
+
+        with lock or contextlib.nullcontext():
+            checkpoint = {"episode": episode,
+                          "agent": agent.state_dict(),
+                          "rng": get_rng_state(),
+                          "extra": {key: copy.copy(value) for key, value in (extra or {}).items()}}
+
+        if env is not None:
+            checkpoint["env"] = {"curriculum": copy.deepcopy(vars(env.curriculum)),
+                                 "rng": copy.deepcopy(env.np_random.bit_generator.state)}
+
+        self.__queue.put(checkpoint)
+
+    def latest(self):
+        """!
+        Finds the newest checkpoint.
+
+        @return string: path of the checkpoint, None if there is none
+        """
+
+        checkpoints = self.__checkpoints()
+
+        return checkpoints[-1] if checkpoints else None
+
+    def restore(self, agent, env=None, path=None):
+        """!
+        Restores the state of the training.
+
+        @param agent (Agent): Agent to restore
+        @param env (Environment): Environment to restore
+        @param path (string): Path of the checkpoint. Defaults to the newest one.
+
+        @return int: last finished episode
+        @return dict: other state of the training loop passed to save
+        """
+
+        path = path or self.latest()
+
+        if path is None:
+            raise FileNotFoundError(f"No checkpoint in {self.directory}")
+
+        # The generator states must stay on the CPU, the rest is moved when loaded
+        checkpoint = T.load(path, map_location="cpu", weights_only=False)
+
+        agent.load_state_dict(checkpoint["agent"])
+        set_rng_state(checkpoint["rng"])
+
+        if env is not None and "env" in checkpoint:
+            vars(env.curriculum).update(checkpoint["env"]["curriculum"])
+            env.np_random.bit_generator.state = checkpoint["env"]["rng"]
+
+        return checkpoint["episode"], checkpoint["extra"]
+
+    def wait(self):
+        """!
+        Waits until all the queued checkpoints are written.
+        """
+
+        self.__queue.join()
+        self.__raise()
+
+    def close(self):
+        """!
+        Writes the queued checkpoints and stops the thread.
+        """
+
+        if self.closed:
+            return
+
+        self.__queue.put(None)
+        self.__thread.join()
+
+        self.closed = True
+
+        self.__raise()
+
+    def __write(self):
+        """!
+        Main loop of the writing thread.
+        """
+
+        while True:
+            checkpoint = self.__queue.get()
+
+            try:
+                if checkpoint is None:
+                    break
+
+                if self.error is None:
+                    self.__save(checkpoint)
+            except Exception as error:
+                self.error = error
+            finally:
+                self.__queue.task_done()
+
+    def __save(self, checkpoint):
+        """!
+        Writes a checkpoint and removes the oldest ones.
+
+        @param checkpoint (dict): State of the training
+        """
+
+        path = os.path.join(self.directory,
+                            f"checkpoint_{checkpoint['episode']}.pt")
+        temporary = path + ".tmp"
+
+        with open(temporary, "wb") as file:
+            T.save(checkpoint, file)
+            file.flush()
+            os.fsync(file.fileno())
+
+        # Atomic, so the checkpoint is either the previous or the new file
+        os.replace(temporary, path)
+
+        for old in self.__checkpoints()[:-self.keep]:
+            os.remove(old)
+
+    def __checkpoints(self):
+        """!
+        Lists the written checkpoints.
+
+        @return list: paths of the checkpoints, from the oldest
+        """
+
+        paths = glob.glob(os.path.join(self.directory, "checkpoint_*.pt"))
+
+        return sorted(paths, key=lambda path: int(re.findall(r"checkpoint_(\d+)\.pt$", path)[0]))
+
+    def __raise(self):
+        """!
+        Raises the error that stopped the writing thread, if any.
+        """
+
+        if self.error is not None:
+            raise RuntimeError("Writing a checkpoint failed") from self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def get_rng_state():
+    """!
+    Copies the states of the global random number generators.
+
+    @return dict: states of the generators of Python, NumPy and Torch
+    """
+
+    state = {"python": random.getstate(),
+             "numpy": np.random.get_state(),
+             "torch": T.get_rng_state()}
+
+    if T.cuda.is_available():
+        state["cuda"] = T.cuda.get_rng_state_all()
+
+    return state
+
+
+def set_rng_state(state):
+    """!
+    Restores the states of the global random number generators.
+
+    @param state (dict): States returned by get_rng_state
+    """
+
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    T.set_rng_state(state["torch"])
+
+    if "cuda" in state and T.cuda.is_available():
+        T.cuda.set_rng_state_all(state["cuda"])
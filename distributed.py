@@ -0,0 +1,410 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import queue
+import time
+import torch as T
+
+
+class ActorLearner():
+    """!
+    Trains an agent with several actor processes and a central learner.
+    Every actor flies its own environment with a CPU copy of the network
+    and its own exploration rate. The transitions are streamed to the learner,
+    the main process, through one shared memory ring per actor.
+    The learner owns the replay buffer and the optimizer, and broadcasts
+    new weights through a shared memory slot guarded by a version counter.
+    """
+
+    def __init__(self, agent, agent_fn, env_fn, num_actors, epsilons=None, ring_size=4096, publish_every=100, seed=None):
+        """!
+        Starts the actor processes.
+
+        @param agent (Agent): Agent trained by the learner
+        @param agent_fn (callable): Function constructing the acting agent of an actor
+        @param env_fn (callable): Function constructing the environment of an actor
+        @param num_actors (int): Number of actor processes
+        @param epsilons (list): Exploration rate of every actor. Defaults to 0.4^(1 + 7i/(N-1)) of actor i.
+        @param ring_size (int): Number of transitions an actor can stream before the learner receives them
+        @param publish_every (int): Number of updates after which the weights are broadcast
+        @param seed (int): Seed from which independent seeds of all the actors are derived
+        """
+
+        if epsilons is None:
+            epsilons = actor_epsilons(num_actors)
+
+        assert len(epsilons) == num_actors
+
+        self.agent = agent
+        self.num_actors = num_actors
+        self.epsilons = list(epsilons)
+        self.ring_size = ring_size
+        self.publish_every = publish_every
+
+        self.updates = 0
+        self.episodes = 0
+
+        row_size = agent.memory.row_size
+        parameters = T.nn.utils.parameters_to_vector(
+            agent.q_eval.parameters())
+
+        self.__memory = []
+
+        # Version followed by the flattened parameters of the network
+        weights = self.__allocate(8 + 4 * len(parameters))
+        self.__version, self.__weights = _weight_views(
+            weights, len(parameters))
+        self.__version[0] = 0
+
+        self.__rings = []
+        for _ in range(num_actors):
+            ring = self.__allocate(16 + 4 * ring_size * row_size)
+            self.__rings.append(_ring_views(ring, ring_size, row_size))
+
+        self.__publish()
+
+        # Torch is not fork-safe once its thread pools are running
+        context = mp.get_context("spawn")
+
+        self.__stop = context.Event()
+        self.__scores = context.Queue()
+        self.__commands = []
+        self.__actors = []
+
+        seeds = np.random.SeedSequence(seed).spawn(num_actors)
+
+        for i in range(num_actors):
+            commands = context.Queue()
+            actor = context.Process(target=_actor, args=(
+                self.__memory[0].name, self.__memory[1 + i].name, len(parameters), ring_size, row_size,
+                agent_fn, env_fn, self.epsilons[i], seeds[i], self.__stop, commands, self.__scores), daemon=True)
+            actor.start()
+
+            self.__commands.append(commands)
+            self.__actors.append(actor)
+
+        self.closed = False
+
+    @property
+    def steps(self):
+        """!
+        Number of environment steps taken by all the actors.
+        """
+
+        return int(sum(counters[0] for counters, _ in self.__rings))
+
+    def train(self, n_games, report_every=10.0, on_episode=None):
+        """!
+        Updates the network with the received transitions until the actors finish enough episodes.
+
+        @param n_games (int): Number of episodes
+        @param report_every (float): Number of seconds between progress reports
+        @param on_episode (callable): Called as on_episode(episode, score) after every finished episode
+        """
+
+        agent = self.agent
+
+        start = None
+        scores = []
+
+        while self.episodes < n_games:
+            received = self.__receive()
+
+            # Rates are measured from the first transition, leaving out the start of the actors
+            if start is None:
+                if received == 0:
+                    time.sleep(1e-3)
+                    continue
+
+                start = last_report = time.perf_counter()
+                first_steps = last_steps = self.steps
+                last_updates, last_episodes = self.updates, self.episodes
+
+            while self.episodes < n_games:
+                try:
+                    score = self.__scores.get_nowait()
+                except queue.Empty:
+                    break
+
+                scores.append(score)
+                if on_episode is not None:
+                    on_episode(self.episodes, score)
+                self.episodes += 1
+
+            if agent.mem_cntr >= agent.batch_size:
+                agent.learn()
+                self.updates += 1
+
+                if self.updates % self.publish_every == 0:
+                    self.__publish()
+            elif received == 0:
+                time.sleep(1e-3)
+
+            now = time.perf_counter()
+
+            if now - last_report >= report_every:
+                self.__check_actors()
+
+                steps = self.steps
+                elapsed = now - last_report
+                print(
+                    f"Episode: {self.episodes}\n\tSteps/s: {(steps - last_steps) / elapsed:.0f}\n\tUpdates/s: {(self.updates - last_updates) / elapsed:.0f}\n\tEpisodes/s: {(self.episodes - last_episodes) / elapsed:.1f}\n\tAverage score: {np.mean(scores[-100:]) if scores else 0:.4f}")
+
+                last_report = now
+                last_steps, last_updates, last_episodes = steps, self.updates, self.episodes
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"Finished {self.episodes} episodes in {elapsed:.1f} s\n\tSteps/s: {(self.steps - first_steps) / elapsed:.0f}\n\tUpdates/s: {self.updates / elapsed:.0f}")
+
+    def call_curriculum(self, method, *args):
+        """!
+        Calls a curriculum method in the environment of every actor, e.g.
+        actor_learner.call_curriculum("set_random_height", 1, 5)
+        The actors apply it once their current episodes finish.
+
+        @param method (string): Name of the Curriculum method
+        @param args: Arguments passed to the method
+        """
+
+        for commands in self.__commands:
+            commands.put((method, args))
+
+    def close(self):
+        """!
+        Stops the actors and frees the shared memory.
+        """
+
+        if self.closed:
+            return
+
+        self.__stop.set()
+        for actor in self.__actors:
+            actor.join(timeout=5)
+            if actor.is_alive():
+                actor.terminate()
+
+        self.__version = self.__weights = None
+        self.__rings = []
+
+        for memory in self.__memory:
+            memory.close()
+            memory.unlink()
+
+        self.closed = True
+
+    def __receive(self):
+        """!
+        Moves the transitions streamed by the actors to the replay buffer.
+
+        @return int: number of received transitions
+        """
+
+        received = 0
+
+        for counters, rows in self.__rings:
+            head, tail = int(counters[0]), int(counters[1])
+
+            if head == tail:
+                continue
+
+            start, stop = tail % self.ring_size, head % self.ring_size
+
+            if start < stop:
+                self.agent.memory.store_transitions(rows[start:stop])
+            else:
+                self.agent.memory.store_transitions(rows[start:])
+                self.agent.memory.store_transitions(rows[:stop])
+
+            # Frees the slots only after the rows are copied
+            counters[1] = head
+            received += head - tail
+
+        return received
+
+    def __publish(self):
+        """!
+        Broadcasts the current weights to the actors.
+        """
+
+        parameters = T.nn.utils.parameters_to_vector(
+            self.agent.q_eval.parameters()).detach().cpu().numpy()
+
+        # An odd version tells the actors that the weights are being written
+        self.__version[0] += 1
+        self.__weights[:] = parameters
+        self.__version[0] += 1
+
+    def __check_actors(self):
+        """!
+        Raises an error if an actor stopped unexpectedly.
+        """
+
+        for i, actor in enumerate(self.__actors):
+            if not actor.is_alive():
+                raise RuntimeError(
+                    f"Actor {i} stopped with exit code {actor.exitcode}")
+
+    def __allocate(self, size):
+        """!
+        Allocates a block of shared memory.
+
+        @param size (int): Size of the block in bytes
+
+        @return SharedMemory: allocated block
+        """
+
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        self.__memory.append(memory)
+
+        return memory
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def actor_epsilons(num_actors, epsilon=0.4, alpha=7):
+    """!
+    Exploration rates of the actors, spread from epsilon down to epsilon^(1 + alpha),
+    so that some actors explore while others follow the learned policy.
+
+    @param num_actors (int): Number of actors
+    @param epsilon (float): Exploration rate of the first actor
+    @param alpha (float): How quickly the exploration rates decrease
+
+    @return list: exploration rate of every actor
+    """
+
+    if num_actors == 1:
+        return [epsilon]
+
+    return [epsilon ** (1 + alpha * i / (num_actors - 1)) for i in range(num_actors)]
+
+
+def _ring_views(memory, ring_size, row_size):
+    """!
+    Creates the views of a transition ring.
+    The actor advances the head after writing a row,
+    the learner advances the tail after reading it.
+
+    @param memory (SharedMemory): Block of the ring
+    @param ring_size (int): Number of rows
+    @param row_size (int): Size of a row
+
+    @return ndarray: (2,) head and tail, counted from the start of the training
+    @return ndarray: (ring_size, row_size) transitions laid out as rows of the replay buffer
+    """
+
+    counters = np.ndarray((2,), np.int64, memory.buf)
+    rows = np.ndarray((ring_size, row_size), np.float32, memory.buf, offset=16)
+
+    return counters, rows
+
+
+def _weight_views(memory, size):
+    """!
+    Creates the views of the broadcast weights.
+
+    @param memory (SharedMemory): Block of the weights
+    @param size (int): Number of parameters
+
+    @return ndarray: (1,) version, odd while the weights are written
+    @return ndarray: (size,) flattened parameters
+    """
+
+    version = np.ndarray((1,), np.int64, memory.buf)
+    weights = np.ndarray((size,), np.float32, memory.buf, offset=8)
+
+    return version, weights
+
+
+def _actor(weights_name, ring_name, n_parameters, ring_size, row_size, agent_fn, env_fn, epsilon, seed, stop, commands, scores):
+    """!
+    Main loop of an actor process.
+
+    @param weights_name (string): Name of the shared memory block of the weights
+    @param ring_name (string): Name of the shared memory block of the transition ring
+    @param n_parameters (int): Number of parameters of the network
+    @param ring_size (int): Number of rows of the ring
+    @param row_size (int): Size of a row
+    @param agent_fn (callable): Function constructing the acting agent
+    @param env_fn (callable): Function constructing the environment
+    @param epsilon (float): Exploration rate of the actor
+    @param seed (SeedSequence): Seed of the actor
+    @param stop (Event): Set when the actor should stop
+    @param commands (Queue): Curriculum methods to call
+    @param scores (Queue): Scores of the finished episodes
+    """
+
+    # Every core is taken by an actor or the learner
+    T.set_num_threads(1)
+
+    generator_seed, torch_seed, env_seed = seed.generate_state(3)
+    np.random.seed(generator_seed)
+    T.manual_seed(int(torch_seed))
+
+    weights_memory = shared_memory.SharedMemory(name=weights_name)
+    ring_memory = shared_memory.SharedMemory(name=ring_name)
+    version, weights = _weight_views(weights_memory, n_parameters)
+    counters, rows = _ring_views(ring_memory, ring_size, row_size)
+
+    agent = agent_fn()
+    agent.epsilon = epsilon
+    parameters = np.empty(n_parameters, dtype=np.float32)
+    loaded = -1
+
+    env = env_fn()
+    observation = env.reset(seed=int(env_seed))
+    n = len(observation)
+    score = 0
+
+    while not stop.is_set():
+        current = version[0]
+
+        if current != loaded and current % 2 == 0:
+            parameters[:] = weights
+
+            # Loaded only if the weights were not overwritten while they were copied
+            if version[0] == current:
+                # The parameters become views of the vector, so it must not be reused
+                T.nn.utils.vector_to_parameters(
+                    T.from_numpy(parameters.copy()), agent.q_act.parameters())
+                loaded = current
+
+        action = agent.choose_action(observation)
+        new_observation, reward, done, _ = env.step(action)
+        score += reward
+
+        # Waits while the learner falls behind
+        while counters[0] - counters[1] >= ring_size and not stop.is_set():
+            time.sleep(1e-3)
+
+        row = rows[counters[0] % ring_size]
+        row[:n] = observation
+        row[n:2*n] = new_observation
+        row[2*n] = action
+        row[2*n + 1] = reward
+        row[2*n + 2] = done
+        counters[0] += 1
+
+        observation = new_observation
+
+        if done:
+            scores.put(score)
+            score = 0
+
+            while True:
+                try:
+                    method, args = commands.get_nowait()
+                except queue.Empty:
+                    break
+                getattr(env.curriculum, method)(*args)
+
+            observation = env.reset()
+
+    del version, weights, counters, rows
+    weights_memory.close()
+    ring_memory.close()
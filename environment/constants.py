@@ -1,6 +1,7 @@
 from enum import IntEnum
 
 # Environment
+OBSERVATION_SIZE = 5
 STARTING_HEIGHT = 1
 GRAVITY = 9.81
 TIMESTEP = 0.02
@@ -52,3 +53,23 @@ class Exploration(IntEnum):
 
     EPSILON_GREEDY = 0
     SOFTMAX = 1
+
+
+class Integrator(IntEnum):
+    """!
+    Enumeration of integration schemes used by the physics engine.
+    """
+
+    SEMI_IMPLICIT_EULER = 0
+    RK4 = 1
+
+
+class LogLevel(IntEnum):
+    """!
+    Enumeration of flight logging levels.
+    """
+
+    OFF = 0
+    TERMINAL = 1
+    DECIMATED = 2
+    FULL = 3
@@ -1,7 +1,6 @@
 import matplotlib.pyplot as plt
 import matplotlib
 import os
-import pandas as pd
 import numpy as np
 import math
 
@@ -89,6 +88,8 @@ class Dashboard():
             f.close()
 
     def plot_rewards(self, dirs):
+        import pandas as pd
+
         plt.plot([200, 200], [-4, 15], color=(0, 0, 0, 0.5))
         plt.plot([1100, 1100], [-4, 15], color=(0, 0, 0, 0.5))
         plt.xlim((0, 2000))
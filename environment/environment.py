@@ -1,15 +1,23 @@
 import math
-import random
 import numpy as np
-import gym
-import cv2
-import os
+import collections
 
 from .rocket import Rocket
 from .tvc import TVC
 from .constants import *
 
 
+# Fields of the state snapshot, in order
+SNAPSHOT_FIELDS = ("position_x", "position_y", "velocity_x", "velocity_y", "angular_velocity",
+                   "rocket_x", "rocket_y", "tvc_x", "tvc_y", "tvc_level", "tvc_thrust",
+                   "timestep", "curriculum_max")
+
+Snapshot = collections.namedtuple("Snapshot", ["state", "rng_state"])
+
+# Used by the curriculum when no generator is given
+_default_rng = np.random.default_rng()
+
+
 class Curriculum():
     """!
     Used for Curriculum Learning.
@@ -79,19 +87,107 @@ class Curriculum():
 
         self.height_increase_rate = rate
 
-    def get_height(self):
+    def get_height(self, rng=None):
         """!
         Calculates spawn height of the rocket based on set parameters.
 
+        @param rng (Generator): Random number generator to sample with
+
         @return float: rocket's height
         """
 
+        return self.sample_heights(1, rng)[0]
+
+    def sample_heights(self, n, rng=None):
+        """!
+        Calculates spawn heights of n rockets based on set parameters.
+        With increasing height, every sample raises the maximum height.
+
+        @param n (int): Number of rockets
+        @param rng (Generator): Random number generator to sample with
+
+        @return ndarray: rockets' heights
+        """
+
         if self.fixed_height:
-            return self.start_height
+            return np.full(n, float(self.start_height))
+
+        # No sample, so the maximum height must not increase
+        if n == 0:
+            return np.empty(0)
+
+        if rng is None:
+            rng = _default_rng
+
+        if self.increasing_height:
+            maximums = np.cumsum(
+                np.concatenate(([self.max], np.full(n, self.height_increase_rate))))[1:]
+            self.max = maximums[-1]
+            high = np.minimum(10, maximums)
         else:
-            if self.increasing_height:
-                self.max += self.height_increase_rate
-            return random.uniform(self.min, min(10, self.max))
+            high = min(10, self.max)
+
+        # Same as random.uniform, which allows the maximum to be smaller than the minimum
+        return self.min + (high - self.min) * rng.random(n)
+
+    def sample_rotations(self, n, rng=None):
+        """!
+        Calculates starting orientations of n rockets based on set parameters.
+
+        @param n (int): Number of rockets
+        @param rng (Generator): Random number generator to sample with
+
+        @return ndarray: x components of the rockets' directions
+        @return ndarray: y components of the rockets' directions
+        """
+
+        if not self.random_rotation:
+            return np.zeros(n), np.ones(n)
+
+        if rng is None:
+            rng = _default_rng
+
+        rotation = rng.uniform(math.pi / 4, math.pi * 3 / 4, n)
+
+        return np.cos(rotation), np.sin(rotation)
+
+    def sample_targets(self, n, rng=None):
+        """!
+        Calculates starting horizontal positions of n rockets,
+        relative to the landing target, based on set parameters.
+
+        @param n (int): Number of rockets
+        @param rng (Generator): Random number generator to sample with
+
+        @return ndarray: rockets' horizontal positions
+        """
+
+        if not self.land_at_target:
+            return np.zeros(n)
+
+        if rng is None:
+            rng = _default_rng
+
+        return rng.uniform(-3, 3, n)
+
+    def sample_initial_conditions(self, n, rng=None):
+        """!
+        Samples the starting conditions of n rockets in one call.
+
+        @param n (int): Number of rockets
+        @param rng (Generator): Random number generator to sample with
+
+        @return ndarray: horizontal positions
+        @return ndarray: heights
+        @return ndarray: x components of the directions
+        @return ndarray: y components of the directions
+        """
+
+        direction_x, direction_y = self.sample_rotations(n, rng)
+        position_x = self.sample_targets(n, rng)
+        position_y = self.sample_heights(n, rng)
+
+        return position_x, position_y, direction_x, direction_y
 
     def disable_x_velocity_reward(self):
         """!
@@ -146,72 +242,126 @@ class Curriculum():
         self.land_at_target = False
 
 
-class Environment(gym.Env):
+class Environment():
     """!
     Class describing the environment.
     Contains the rocket and the engine mount.
     All the interaction with the environment should happen
     through this module.
+    Follows the interface of gym.Env without deriving from it, because
+    importing gym loads OpenCV through gym.wrappers.
     """
 
-    def __init__(self):
+    def __init__(self, log_level=LogLevel.FULL, log_every=1, analytic_coasting=False, dt=TIMESTEP, substeps=1, integrator=Integrator.SEMI_IMPLICIT_EULER):
         """!
         Constructs the environment.
+
+        @param log_level (LogLevel): Which steps of the flight are logged
+        @param log_every (int): Logs every k-th step when the level is DECIMATED
+        @param analytic_coasting (bool): Whether the unpowered flight is integrated analytically
+        @param dt (float): Length of a single timestep in seconds
+        @param substeps (int): Number of integration steps per timestep
+        @param integrator (Integrator): Integration scheme of the physics engine
         """
 
-        super(Environment, self).__init__()
+        self.analytic_coasting = analytic_coasting
+
+        self.dt = dt
+        self.substeps = substeps
+        self.integrator = integrator
 
         self.canvas_shape = (1500, 1200, 3)
-        self.background = cv2.imread(os.path.join(
-            os.path.dirname(os.path.realpath(__file__)), "img/bg.png"))
+        self.renderer = None
+        self.window_open = False
 
         self.curriculum = Curriculum()
+
+        self.rocket = Rocket(0, STARTING_HEIGHT, WEIGHT,
+                             MOMENT_OF_INERTIA, CENTER_OF_MASS, log_level=log_level, log_every=log_every)
+        self.tvc = TVC(MAX_THRUST, MAX_ROTATION)
+
+        self.__action_space = None
+        self.__observation_space = None
+
+        # Unseeded until reset is given a seed
+        self.np_random = np.random.default_rng()
+
         self.reset()
 
-        self.action_space = gym.spaces.Discrete(4)
+    @property
+    def action_space(self):
+        """!
+        Discrete space of the 4 actions, created on first use.
+        """
+
+        if self.__action_space is None:
+            # Loads gym and OpenCV, which the simulation does not need
+            import gym.spaces
 
-    def reset(self):
+            self.__action_space = gym.spaces.Discrete(4)
+
+        return self.__action_space
+
+    @property
+    def observation_space(self):
+        """!
+        Space of the observations, created on first use.
+        """
+
+        if self.__observation_space is None:
+            # Loads gym and OpenCV, which the simulation does not need
+            import gym.spaces
+
+            # Height, vertical velocity, horizontal velocity, angular velocity, angle with y-axis
+            high = np.array([np.inf, np.inf, np.inf, np.inf, math.pi / 2], dtype=np.float32)
+            self.__observation_space = gym.spaces.Box(-high, high, dtype=np.float32)
+
+        return self.__observation_space
+
+    def reset(self, seed=None, out=None):
         """!
         Resets the environment to conditions defined
         by curriculum and predefined constants
 
-        @return list: current state of the environment
+        @param seed (int): Seed of the environment's random number generator.
+                           The generator is left as it is by default.
+        @param out (ndarray): Buffer to write the observation to
+
+        @return ndarray: current state of the environment
         """
 
-        start_dx = 0
-        start_dy = 1
-        if self.curriculum.random_rotation:
-            rotation = random.uniform(math.pi / 4, math.pi * 3 / 4)
-            start_dx = math.cos(rotation)
-            start_dy = math.sin(rotation)
+        if seed is not None:
+            self.np_random = np.random.default_rng(seed)
 
-        start_position = 0
-        if self.curriculum.land_at_target:
-            start_position = random.uniform(-3, 3)
+        start_position, start_height, start_dx, start_dy = [
+            value.item() for value in self.curriculum.sample_initial_conditions(1, self.np_random)]
 
-        self.rocket = Rocket(start_position, self.curriculum.get_height(), WEIGHT,
-                             MOMENT_OF_INERTIA, CENTER_OF_MASS, dir_x=start_dx, dir_y=start_dy)
-        self.tvc = TVC(MAX_THRUST, MAX_ROTATION,
-                       dir_x=start_dx, dir_y=start_dy)
+        self.rocket.reset(start_position, start_height,
+                          dir_x=start_dx, dir_y=start_dy)
+        self.tvc.reset(dir_x=start_dx, dir_y=start_dy)
 
         self.timestep = 0
 
         self.close()
 
-        return self.__get_state()
+        return self.__get_state(out)
 
-    def step(self, action):
+    def step(self, action, repeat=1, out=None):
         """!
-        Updates the environment for one timestep.
+        Updates the environment for one or more timesteps.
 
-        @param action (Action): _description_
+        @param action (Action): Action to take
+        @param repeat (int): Number of timesteps the action is repeated for.
+                             Stops early if the simulation finishes.
+        @param out (ndarray): Buffer to write the observation to
 
-        @return list: newly observed state of the environment
-        @return float: sampled reward
+        @return ndarray: newly observed state of the environment
+        @return float: sampled reward, summed over the repeated timesteps
         @return boolean: whether or not the simulation is finished
         @return dict: additional information
         """
 
+        # Repeating an action does not move the TVC mount any further
         if action == Action.LEFT:
             self.tvc.set_rotation_left()
             self.tvc.set_max_thrust()
@@ -224,48 +374,101 @@ class Environment(gym.Env):
         else:
             self.tvc.set_min_thrust()
 
-        self.rocket.update_position(self.tvc)
-        self.rocket.log(self.tvc, self.timestep)
+        if self.analytic_coasting and action == Action.NOTHING:
+            reward, done = self.__coast(repeat * self.dt)
+            return self.__get_state(out), reward, done, {}
 
-        reward = -PENALTY_PER_SECOND * TIMESTEP
+        reward = 0
+        for _ in range(repeat):
+            step_reward, done = self.__simulate()
+            reward += step_reward
 
-        if self.rocket.position_y <= 0:
-            reward = REWARD_LANDING - abs(self.rocket.velocity_y + 1) - \
-                PENALTY_PER_RADIAN_AT_LANDING * self.rocket.get_unsigned_angle_with_y_axis() - \
-                PENALTY_PER_ANGULAR_VELOCITY_AT_LANDING * \
-                abs(self.rocket.angular_velocity)
+            if done:
+                break
 
-            if self.curriculum.x_velocity_reward:
-                reward -= PENALTY_PER_HORIZONTAL_VELOCITY * \
-                    abs(self.rocket.velocity_x)
+        return self.__get_state(out), reward, done, {}
 
-            if self.curriculum.land_at_target:
-                reward -= PENALTY_PER_HORIZONTAL_POSITION * \
-                    abs(self.rocket.position_x)
+    def get_state_snapshot(self, include_rng=False):
+        """!
+        Captures the physical state of the environment,
+        so that the simulation can be branched, e.g. by a planner.
+        Flight log and images are not part of the snapshot.
+
+        @param include_rng (bool): Whether the state of the random number generator is captured too
+
+        @return Snapshot: state as an array with SNAPSHOT_FIELDS and, optionally, the generator's state
+        """
 
-        self.timestep += TIMESTEP
+        rocket = self.rocket
+        tvc = self.tvc
 
-        return self.__get_state(), reward, self.rocket.position_y <= 0 or abs(self.rocket.position_x) > 10, {}
+        state = np.array((rocket.position_x, rocket.position_y, rocket.velocity_x, rocket.velocity_y,
+                          rocket.angular_velocity, rocket.x, rocket.y, tvc.x, tvc.y, tvc.level,
+                          tvc.current_thrust, self.timestep, getattr(self.curriculum, "max", math.nan)))
+
+        return Snapshot(state, self.np_random.bit_generator.state if include_rng else None)
+
+    def restore_state_snapshot(self, snapshot, out=None):
+        """!
+        Brings the environment back to a captured state.
+
+        @param snapshot (Snapshot): State captured with get_state_snapshot
+        @param out (ndarray): Buffer to write the observation to
+
+        @return ndarray: current state of the environment
+        """
+
+        rocket = self.rocket
+        tvc = self.tvc
+
+        (rocket.position_x, rocket.position_y, rocket.velocity_x, rocket.velocity_y,
+         rocket.angular_velocity, rocket.x, rocket.y, tvc.x, tvc.y, tvc.level,
+         tvc.current_thrust, self.timestep, curriculum_max) = snapshot.state.tolist()
+
+        if not math.isnan(curriculum_max):
+            self.curriculum.max = curriculum_max
+
+        if snapshot.rng_state is not None:
+            self.np_random.bit_generator.state = snapshot.rng_state
+
+        return self.__get_state(out)
+
+    def set_log_level(self, level, every=1):
+        """!
+        Changes which steps of the flight are logged.
+
+        @param level (LogLevel): Which steps are logged
+        @param every (int): Logs every k-th step when the level is DECIMATED
+        """
+
+        self.rocket.flight_log.set_level(level, every)
 
     def render(self, mode="human"):
         """!
         Renders the current state to a human-readable image.
 
-        @param mode (string): "human" to display, "rgb-array" to get a 2D array
+        @param mode (string): "human" to display, "rgb_array" to get a 2D array
 
-        @return: 2D array with image if rgb-array mode is selected.
+        @return: uint8 BGR image if rgb_array mode is selected.
+                 The image is reused and overwritten by the next call.
         """
 
-        self.__draw_on_canvas()
-
         assert mode in ["human", "rgb_array"]
 
+        if self.renderer is None:
+            # OpenCV is only loaded once something is rendered
+            from .renderer import Renderer
+            self.renderer = Renderer()
+
+        self.canvas = self.renderer.draw(self.rocket.position_x, self.rocket.position_y,
+                                         self.rocket.x, self.rocket.y,
+                                         self.tvc.current_thrust, self.tvc.level)
+
         if mode == "human":
             try:
-                self.canvas = cv2.resize(
-                    self.canvas, (int(self.canvas.shape[1] / 2.5), int(self.canvas.shape[0] / 2.5)))
-                cv2.imshow("Rocket landing", self.canvas)
-                cv2.waitKey(int(2000*TIMESTEP))
+                # Displayed at half of the real-time speed
+                self.renderer.show(2 * self.dt)
+                self.window_open = True
             except:
                 pass
 
@@ -277,72 +480,144 @@ class Environment(gym.Env):
         Destroys all windows.
         """
 
-        cv2.destroyAllWindows()
-        cv2.waitKey(1)
+        if not self.window_open:
+            return
+
+        from . import renderer
+
+        renderer.close_windows()
+
+        self.window_open = False
+
+    @property
+    def background(self):
+        from .renderer import get_background
+        return get_background()
 
-    def __draw_on_canvas(self):
+    def __simulate(self):
         """!
-        Draws all objects on canvas to render
+        Moves the rocket by a single timestep.
+        The timestep is split into substeps, stopping at the first
+        substep that finishes the simulation.
+
+        @return float: sampled reward
+        @return boolean: whether or not the simulation is finished
         """
 
-        GROUND_HEIGHT = 150
+        substep = self.dt / self.substeps
 
-        screen_rocket_pos_y = int(
-            self.canvas_shape[0] - (self.rocket.position_y * 110)) - self.rocket.icon_idle.shape[0] // 2 - GROUND_HEIGHT
-        screen_rocket_pos_x = int(
-            (self.rocket.position_x + 11) * 55) - self.rocket.icon_idle.shape[1]//2
+        for _ in range(self.substeps):
+            self.rocket.update_position(self.tvc, substep, self.integrator)
 
-        if screen_rocket_pos_x < 0:
-            return
-        if screen_rocket_pos_y < 0:
-            return
+            done = self.rocket.position_y <= 0 or abs(self.rocket.position_x) > 10
+            if done:
+                break
 
-        if screen_rocket_pos_x + self.rocket.icon_idle.shape[1] >= self.canvas_shape[1]:
-            return
-        if screen_rocket_pos_y + self.rocket.icon_idle.shape[0] >= self.canvas_shape[0]:
-            return
+        self.rocket.log(self.tvc, self.timestep, terminal=done)
+
+        reward = -PENALTY_PER_SECOND * self.dt
 
-        self.canvas = np.ones(shape=self.canvas_shape)
-        self.canvas[:, :] = self.background / 255
+        if self.rocket.position_y <= 0:
+            reward = self.__get_landing_reward()
+
+        self.timestep += self.dt
+
+        return reward, done
+
+    def __coast(self, duration):
+        """!
+        Moves the unpowered rocket using the closed-form solution
+        of its ballistic flight. Stops exactly at the moment
+        the rocket touches the ground or leaves the bounds.
+
+        @param duration (float): Time to coast for in seconds
+
+        @return float: sampled reward
+        @return boolean: whether or not the simulation is finished
+        """
+
+        rocket = self.rocket
+
+        # Solving position_y + velocity_y * t - GRAVITY * t^2 / 2 = 0
+        contact_time = 0
+        if rocket.position_y > 0:
+            contact_time = (rocket.velocity_y + math.sqrt(
+                rocket.velocity_y ** 2 + 2 * GRAVITY * rocket.position_y)) / GRAVITY
+
+        exit_time = math.inf
+        if rocket.velocity_x != 0:
+            exit_time = (math.copysign(10, rocket.velocity_x) -
+                         rocket.position_x) / rocket.velocity_x
+
+        # Touching the ground wins ties, as in __simulate, where it is checked after the move
+        landed = contact_time <= min(duration, exit_time)
+        done = landed or exit_time <= duration
+        time = min(duration, contact_time, exit_time)
+
+        rocket.coast(self.tvc, time)
+        if landed:
+            rocket.position_y = 0.0
+
+        rocket.log(self.tvc, self.timestep, terminal=done)
 
-        angle = math.atan2(self.rocket.y, self.rocket.x) - math.pi/2
+        # Rewarded per started timestep like __simulate, where the landing
+        # reward replaces the penalty of the timestep the rocket lands in
+        steps = max(1, math.ceil(time / self.dt - 1e-9))
 
-        rot_mat = cv2.getRotationMatrix2D(
-            (self.rocket.icon_idle.shape[1]//2, self.rocket.icon_idle.shape[0]//2), math.degrees(angle), 1.0)
+        if landed:
+            reward = -PENALTY_PER_SECOND * self.dt * (steps - 1) + self.__get_landing_reward()
+        else:
+            reward = -PENALTY_PER_SECOND * self.dt * steps
+
+        self.timestep += time
+
+        return reward, done
+
+    def __get_landing_reward(self):
+        """!
+        Calculates the reward for the rocket's state at the impact with the ground.
+
+        @return float: sampled reward
+        """
 
-        if self.tvc.current_thrust == 0:
-            rocket_icon = cv2.warpAffine(
-                self.rocket.icon_idle, rot_mat, self.rocket.icon_idle.shape[1::-1], flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
-        elif abs(self.tvc.level) < 0.01:
-            rocket_icon = cv2.warpAffine(
-                self.rocket.icon_mid, rot_mat, self.rocket.icon_idle.shape[1::-1], flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
-        elif self.tvc.level < 0:
-            rocket_icon = cv2.warpAffine(
-                self.rocket.icon_left, rot_mat, self.rocket.icon_idle.shape[1::-1], flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
-        elif self.tvc.level > 0:
-            rocket_icon = cv2.warpAffine(
-                self.rocket.icon_right, rot_mat, self.rocket.icon_idle.shape[1::-1], flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+        reward = REWARD_LANDING - abs(self.rocket.velocity_y + 1) - \
+            PENALTY_PER_RADIAN_AT_LANDING * self.rocket.get_unsigned_angle_with_y_axis() - \
+            PENALTY_PER_ANGULAR_VELOCITY_AT_LANDING * \
+            abs(self.rocket.angular_velocity)
 
-        self.canvas[screen_rocket_pos_y: screen_rocket_pos_y + self.rocket.icon_idle.shape[0],
-                    screen_rocket_pos_x: screen_rocket_pos_x + self.rocket.icon_idle.shape[1], :] = cv2.add(self.canvas[screen_rocket_pos_y: screen_rocket_pos_y + self.rocket.icon_idle.shape[0],
-                                                                                                                        screen_rocket_pos_x: screen_rocket_pos_x + self.rocket.icon_idle.shape[1], :], (np.asarray(rocket_icon, np.float64) / 255))
+        if self.curriculum.x_velocity_reward:
+            reward -= PENALTY_PER_HORIZONTAL_VELOCITY * \
+                abs(self.rocket.velocity_x)
 
-    def __get_state(self):
+        if self.curriculum.land_at_target:
+            reward -= PENALTY_PER_HORIZONTAL_POSITION * \
+                abs(self.rocket.position_x)
+
+        return reward
+
+    def __get_state(self, out=None):
         """!
         Generates a vector describing the environment
 
-        @return list: description of the environment
+        @param out (ndarray): Buffer to write the description to. A new one is allocated by default.
+
+        @return ndarray: description of the environment, laid out as observation_space
         """
 
-        state = []
-        state.append(self.rocket.position_y)
-        state.append(self.rocket.velocity_y)
-        state.append(self.rocket.velocity_x)
-        state.append(self.rocket.angular_velocity)
-        state.append(self.rocket.get_signed_angle_with_y_axis())
+        if out is None:
+            out = np.empty(OBSERVATION_SIZE, dtype=np.float32)
 
-        return state
+        out[:] = (self.rocket.position_y, self.rocket.velocity_y, self.rocket.velocity_x,
+                  self.rocket.angular_velocity, self.rocket.get_signed_angle_with_y_axis())
+
+        return out
 
     def __str__(self):
         along, side = self.rocket.get_rotated_vectors()
         return f"Environment:\n\tRocket: {self.rocket}\n\tTVC: {self.tvc}\n\tImpact on rocket: \n\t\tPush: {self.tvc.current_thrust * self.tvc.get_component_along_vector(along):.2f} N\n\t\tRotate: {self.tvc.current_thrust * self.tvc.get_component_along_vector(side):.2f} N"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
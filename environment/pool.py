@@ -0,0 +1,235 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import os
+
+from .environment import Environment
+from .constants import OBSERVATION_SIZE
+
+
+class EnvironmentPool():
+    """!
+    Runs environments in several worker processes.
+    Each worker owns a slice of the environments. Actions, observations,
+    rewards and dones are exchanged through shared memory, so only
+    short commands are sent between the processes.
+    Finished environments are reset automatically.
+    The workers are spawned, so each of them imports the main module
+    once when the pool starts.
+    """
+
+    def __init__(self, num_envs, num_workers=None, env_fn=Environment):
+        """!
+        Starts the worker processes.
+
+        @param num_envs (int): Total number of environments
+        @param num_workers (int): Number of worker processes. Defaults to the number of CPU cores.
+        @param env_fn (callable): Function constructing a single environment.
+                                  It is sent to the workers, so it must be picklable.
+        """
+
+        if num_workers is None:
+            num_workers = os.cpu_count()
+
+        self.num_envs = num_envs
+        self.num_workers = min(num_workers, num_envs)
+
+        self.__memory = []
+
+        self.observations = self.__allocate(
+            (num_envs, OBSERVATION_SIZE), np.float32)
+        self.final_observations = self.__allocate(
+            (num_envs, OBSERVATION_SIZE), np.float32)
+        self.actions = self.__allocate((num_envs,), np.int64)
+        self.rewards = self.__allocate((num_envs,), np.float64)
+        self.dones = self.__allocate((num_envs,), np.bool_)
+
+        names = [memory.name for memory in self.__memory]
+        bounds = np.linspace(0, num_envs, self.num_workers + 1, dtype=int)
+
+        self.__connections = []
+        self.__workers = []
+        self.__slices = list(zip(bounds[:-1], bounds[1:]))
+
+        # Torch is not fork-safe once its thread pools are running
+        context = mp.get_context("spawn")
+
+        for start, stop in self.__slices:
+            parent_connection, worker_connection = context.Pipe()
+            worker = context.Process(target=_worker, args=(
+                worker_connection, names, num_envs, start, stop, env_fn), daemon=True)
+            worker.start()
+            worker_connection.close()
+
+            self.__connections.append(parent_connection)
+            self.__workers.append(worker)
+
+        self.closed = False
+
+    def reset(self, seed=None):
+        """!
+        Resets all the environments.
+
+        @param seed (int): Seed from which independent seeds of all the environments are derived.
+                           Generators are left as they are by default.
+
+        @return ndarray: (N, 5) current states of the environments
+        """
+
+        if seed is None:
+            self.__broadcast("reset")
+        else:
+            seeds = np.random.SeedSequence(seed).spawn(self.num_envs)
+            for connection, (start, stop) in zip(self.__connections, self.__slices):
+                connection.send(("reset", seeds[start:stop]))
+            for connection in self.__connections:
+                connection.recv()
+
+        return self.observations.copy()
+
+    def step(self, actions):
+        """!
+        Updates all the environments for one timestep.
+
+        @param actions (list): N actions to take, one per environment
+
+        @return ndarray: (N, 5) newly observed states of the environments
+        @return ndarray: (N,) sampled rewards
+        @return ndarray: (N,) whether or not each simulation is finished
+        @return dict: additional information. "final_observation" holds
+                      the states observed before the automatic reset.
+        """
+
+        self.actions[:] = actions
+
+        self.__broadcast("step")
+
+        info = {"final_observation": self.final_observations.copy()}
+
+        return self.observations.copy(), self.rewards.copy(), self.dones.copy(), info
+
+    def call_curriculum(self, method, *args):
+        """!
+        Calls a curriculum method in every environment, e.g.
+        pool.call_curriculum("set_random_height", 1, 5)
+
+        @param method (string): Name of the Curriculum method
+        @param args: Arguments passed to the method
+        """
+
+        self.__broadcast("curriculum", (method, args))
+
+    def close(self):
+        """!
+        Stops the workers and frees the shared memory.
+        """
+
+        if self.closed:
+            return
+
+        for connection in self.__connections:
+            connection.send(("close", None))
+        for worker in self.__workers:
+            worker.join()
+
+        self.observations = self.final_observations = None
+        self.actions = self.rewards = self.dones = None
+
+        for memory in self.__memory:
+            memory.close()
+            memory.unlink()
+
+        self.closed = True
+
+    def __broadcast(self, command, args=None):
+        """!
+        Sends a command to all the workers and waits until they finish.
+
+        @param command (string): Command to execute
+        @param args: Arguments of the command
+        """
+
+        for connection in self.__connections:
+            connection.send((command, args))
+        for connection in self.__connections:
+            connection.recv()
+
+    def __allocate(self, shape, dtype):
+        """!
+        Allocates an array in shared memory.
+
+        @param shape (tuple): Shape of the array
+        @param dtype (type): Type of the array
+
+        @return ndarray: Array backed by the shared memory
+        """
+
+        size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        self.__memory.append(memory)
+
+        return np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _worker(connection, names, num_envs, start, stop, env_fn):
+    """!
+    Main loop of a worker process.
+
+    @param connection (Connection): Pipe used to receive commands
+    @param names (list): Names of the shared memory blocks
+    @param num_envs (int): Total number of environments in the pool
+    @param start (int): Index of the first environment owned by this worker
+    @param stop (int): Index after the last environment owned by this worker
+    @param env_fn (callable): Function constructing a single environment
+    """
+
+    memory = [shared_memory.SharedMemory(name=name) for name in names]
+    observations = np.ndarray(
+        (num_envs, OBSERVATION_SIZE), np.float32, memory[0].buf)
+    final_observations = np.ndarray(
+        (num_envs, OBSERVATION_SIZE), np.float32, memory[1].buf)
+    actions = np.ndarray((num_envs,), np.int64, memory[2].buf)
+    rewards = np.ndarray((num_envs,), np.float64, memory[3].buf)
+    dones = np.ndarray((num_envs,), np.bool_, memory[4].buf)
+
+    envs = [env_fn() for _ in range(start, stop)]
+
+    while True:
+        command, args = connection.recv()
+
+        if command == "step":
+            for i, env in enumerate(envs, start):
+                _, reward, done, _ = env.step(
+                    actions[i], out=observations[i])
+
+                rewards[i] = reward
+                dones[i] = done
+
+                if done:
+                    final_observations[i] = observations[i]
+                    env.reset(out=observations[i])
+
+        elif command == "reset":
+            seeds = args or [None] * len(envs)
+            for i, (env, seed) in enumerate(zip(envs, seeds), start):
+                env.reset(seed=seed, out=observations[i])
+
+        elif command == "curriculum":
+            method, method_args = args
+            for env in envs:
+                getattr(env.curriculum, method)(*method_args)
+
+        elif command == "close":
+            break
+
+        connection.send(None)
+
+    del observations, final_observations, actions, rewards, dones
+    for block in memory:
+        block.close()
@@ -0,0 +1,268 @@
+import os
+import queue
+import threading
+
+from .constants import *
+
+
+class Recorder():
+    """!
+    Records episodes to video files on a background thread.
+    The training loop only puts physical states or frames on a queue.
+    Frames are drawn, if needed, and encoded by the thread,
+    so the loop never waits for the encoder. When the encoder
+    falls behind and the queue fills up, new frames are dropped.
+    """
+
+    def __init__(self, directory=os.path.join("logs", "videos"), every=100, extension="mp4", fps=None, scale=0.4, queue_size=1024):
+        """!
+        Starts the recording thread.
+
+        @param directory (string): Directory the videos are saved to
+        @param every (int): Records every k-th episode
+        @param extension (string): "mp4" to encode with OpenCV, "gif" to encode with Pillow
+        @param fps (float): Frame rate of the videos. Defaults to one frame per timestep
+                            of the environment passed to start_episode.
+        @param scale (float): Size of the videos relative to the rendered canvas
+        @param queue_size (int): Maximum number of frames waiting for the encoder
+        """
+
+        assert extension in ["mp4", "gif"]
+
+        self.directory = directory
+        self.every = every
+        self.extension = extension
+        self.fps = fps
+        self.scale = scale
+        self.queue_size = queue_size
+
+        self.recording = False
+        self.dropped = 0
+
+        # Control messages are never dropped, so the queue itself is unbounded
+        self.__queue = queue.Queue()
+        self.__thread = threading.Thread(target=self.__encode, daemon=True)
+        self.__thread.start()
+
+        self.closed = False
+
+    def start_episode(self, episode, env=None):
+        """!
+        Starts recording an episode, if it is one of the recorded ones.
+
+        @param episode (int): Episode number
+        @param env (Environment): Recorded environment, whose timestep sets the default frame rate
+
+        @return bool: whether the episode is recorded
+        """
+
+        self.recording = episode % self.every == 0
+
+        if self.recording:
+            # Videos play in real time, whatever the timestep of the environment
+            fps = self.fps or 1 / (env.dt if env is not None else TIMESTEP)
+
+            self.__queue.put(("start", (os.path.join(
+                self.directory, f"flight_{episode}.{self.extension}"), fps)))
+
+        return self.recording
+
+    def record(self, env):
+        """!
+        Records the current physical state of an environment.
+        The frame is drawn by the recording thread.
+
+        @param env (Environment): Recorded environment
+        """
+
+        if self.recording:
+            self.__put("state", env.get_state_snapshot().state)
+
+    def record_frame(self, frame):
+        """!
+        Records an already rendered frame, e.g. from render(mode="rgb_array").
+
+        @param frame (ndarray): uint8 BGR image. It is copied, so it can be reused right away.
+        """
+
+        if self.recording:
+            self.__put("frame", frame.copy())
+
+    def end_episode(self):
+        """!
+        Finishes recording the current episode.
+        The video is written once the thread encodes all of its frames.
+        """
+
+        if self.recording:
+            self.__queue.put(("end", None))
+
+        self.recording = False
+
+    def close(self):
+        """!
+        Waits until all the recorded episodes are encoded and stops the thread.
+        """
+
+        if self.closed:
+            return
+
+        self.end_episode()
+        self.__queue.put(("close", None))
+        self.__thread.join()
+
+        self.closed = True
+
+    def __put(self, kind, data):
+        """!
+        Puts a frame on the queue without waiting.
+
+        @param kind (string): "state" or "frame"
+        @param data (ndarray): Physical state or image
+        """
+
+        if self.__queue.qsize() >= self.queue_size:
+            self.dropped += 1
+            return
+
+        self.__queue.put((kind, data))
+
+    def __encode(self):
+        """!
+        Main loop of the recording thread.
+        """
+
+        # OpenCV is loaded by the thread, and only once something is recorded
+        renderer = None
+        writer = None
+
+        while True:
+            command, data = self.__queue.get()
+
+            if command == "start":
+                if writer is not None:
+                    writer.close()
+                path, fps = data
+                writer = _GifWriter(path, fps) if self.extension == "gif" else _Mp4Writer(
+                    path, fps)
+
+            elif command in ["state", "frame"]:
+                if writer is None:
+                    continue
+
+                if command == "state":
+                    if renderer is None:
+                        from .renderer import Renderer
+                        renderer = Renderer()
+                    data = renderer.draw_snapshot(data)
+
+                writer.write(data, self.scale)
+
+            elif command == "end":
+                if writer is not None:
+                    writer.close()
+                writer = None
+
+            elif command == "close":
+                break
+
+        if writer is not None:
+            writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _Mp4Writer():
+    """!
+    Encodes frames to an MP4 file with OpenCV.
+    """
+
+    def __init__(self, path, fps):
+        """!
+        Prepares the file. It is opened once the size of the frames is known.
+
+        @param path (string): Path of the video
+        @param fps (float): Frame rate of the video
+        """
+
+        import cv2
+
+        self.cv2 = cv2
+        self.path = path
+        self.fps = fps
+        self.writer = None
+
+    def write(self, frame, scale):
+        """!
+        Encodes a frame.
+
+        @param frame (ndarray): uint8 BGR image
+        @param scale (float): Size of the video relative to the frame
+        """
+
+        frame = self.cv2.resize(frame, None, fx=scale, fy=scale,
+                                interpolation=self.cv2.INTER_AREA)
+
+        if self.writer is None:
+            self.writer = self.cv2.VideoWriter(self.path, self.cv2.VideoWriter_fourcc(*"mp4v"),
+                                               self.fps, frame.shape[1::-1])
+
+        self.writer.write(frame)
+
+    def close(self):
+        """!
+        Finishes the file.
+        """
+
+        if self.writer is not None:
+            self.writer.release()
+
+
+class _GifWriter():
+    """!
+    Collects frames and saves them to a GIF file with Pillow.
+    """
+
+    def __init__(self, path, fps):
+        """!
+        Prepares the file.
+
+        @param path (string): Path of the animation
+        @param fps (float): Frame rate of the animation
+        """
+
+        import cv2
+        from PIL import Image
+
+        self.cv2 = cv2
+        self.image = Image
+        self.path = path
+        self.fps = fps
+        self.frames = []
+
+    def write(self, frame, scale):
+        """!
+        Adds a frame to the animation.
+
+        @param frame (ndarray): uint8 BGR image
+        @param scale (float): Size of the animation relative to the frame
+        """
+
+        frame = self.cv2.resize(frame, None, fx=scale, fy=scale,
+                                interpolation=self.cv2.INTER_AREA)
+        self.frames.append(self.image.fromarray(frame[:, :, ::-1]))
+
+    def close(self):
+        """!
+        Saves the animation.
+        """
+
+        if len(self.frames) == 0:
+            return
+
+        self.frames[0].save(self.path, save_all=True, append_images=self.frames[1:],
+                            duration=1000 / self.fps, loop=0)
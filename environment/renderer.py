@@ -0,0 +1,368 @@
+import math
+import cv2
+import os
+import functools
+import numpy as np
+
+from .constants import *
+
+# Height of the ground on the canvas in pixels
+GROUND_HEIGHT = 150
+
+# Pixels per meter along the axes of the canvas
+PIXELS_PER_METER_X = 55
+PIXELS_PER_METER_Y = 110
+
+# Resolution of the cache of rotated sprites in degrees
+ANGLE_RESOLUTION = 0.5
+
+# Sprites of the rocket, by the state of the engine
+ICON_NAMES = ("idle", "middle", "right", "left")
+
+
+@functools.lru_cache(maxsize=None)
+def get_background():
+    """!
+    Loads the background image. It is read from disk
+    only once per process and shared between all the environments.
+
+    @return ndarray: background image
+    """
+
+    return cv2.imread(os.path.join(
+        os.path.dirname(os.path.realpath(__file__)), "img/bg.png"))
+
+
+@functools.lru_cache(maxsize=None)
+def get_icons():
+    """!
+    Loads the rocket sprites. Sprites are read from disk
+    only once per process and shared between all the rockets.
+
+    @return dict: sprites of the idle rocket and of the rocket firing its engine to the left, middle and right
+    """
+
+    rocket_width = 250
+    icons = {}
+
+    for name in ICON_NAMES:
+        icon = cv2.imread(os.path.join(
+            os.path.dirname(os.path.realpath(__file__)), f"img/rocket_{name}.png"))
+        icons[name] = cv2.resize(icon, (rocket_width, rocket_width))
+
+    return icons
+
+
+@functools.lru_cache(maxsize=1024)
+def get_rotated_icon(name, step, resolution=ANGLE_RESOLUTION):
+    """!
+    Rotates a rocket sprite and crops it to the pixels it covers.
+    Rotations are quantized and cached, so that every one
+    of them is computed only once per process.
+
+    @param name (string): Name of the sprite, as in get_icons
+    @param step (int): Rotation in multiples of the resolution, counterclockwise
+    @param resolution (float): Size of a single rotation step in degrees
+
+    @return int: row of the cropped sprite within the full sprite
+    @return int: column of the cropped sprite within the full sprite
+    @return ndarray: cropped sprite
+    """
+
+    icon = get_icons()[name]
+
+    rot_mat = cv2.getRotationMatrix2D(
+        (icon.shape[1]//2, icon.shape[0]//2), step * resolution, 1.0)
+    rotated = cv2.warpAffine(icon, rot_mat, icon.shape[1::-1], flags=cv2.INTER_LINEAR,
+                             borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+
+    rows = np.flatnonzero(rotated.any(axis=(1, 2)))
+    columns = np.flatnonzero(rotated.any(axis=(0, 2)))
+
+    if len(rows) == 0:
+        return 0, 0, rotated[:0, :0]
+
+    top, bottom = rows[0], rows[-1] + 1
+    left, right = columns[0], columns[-1] + 1
+
+    return top, left, np.ascontiguousarray(rotated[top:bottom, left:right])
+
+
+def get_icon_name(thrust, level):
+    """!
+    Chooses the sprite showing the state of the engine.
+
+    @param thrust (float): Current thrust of the engine
+    @param level (float): Current rotation of the TVC mount
+
+    @return string: name of the sprite
+    """
+
+    if thrust == 0:
+        return "idle"
+    elif abs(level) < 0.01:
+        return "middle"
+    elif level < 0:
+        return "left"
+    else:
+        return "right"
+
+
+class Renderer():
+    """!
+    Draws the scene on a uint8 canvas.
+    The canvas is allocated once and reused between frames. Only the region
+    covered by the rocket in the previous frame is restored from the background,
+    and the rotated sprites come from a cache of quantized angles.
+    """
+
+    def __init__(self, resolution=ANGLE_RESOLUTION):
+        """!
+        Constructs the renderer.
+
+        @param resolution (float): Angle between the cached rotations of the sprites in degrees
+        """
+
+        self.resolution = resolution
+
+        self.background = get_background()
+        self.canvas = self.background.copy()
+
+        self.icon_shape = get_icons()["idle"].shape
+
+        # Rectangle of the canvas changed by the previous frame
+        self.__dirty = None
+        self.__window = None
+
+    def draw(self, position_x, position_y, x, y, thrust, level):
+        """!
+        Draws the rocket described by its physical state.
+
+        @param position_x (float): Horizontal position of the rocket
+        @param position_y (float): Vertical position of the rocket
+        @param x (float): x component of the rocket's direction
+        @param y (float): y component of the rocket's direction
+        @param thrust (float): Current thrust of the engine
+        @param level (float): Current rotation of the TVC mount
+
+        @return ndarray: canvas, overwritten by the next frame
+        """
+
+        if self.__dirty is not None:
+            top, bottom, left, right = self.__dirty
+            self.canvas[top:bottom, left:right] = self.background[top:bottom, left:right]
+            self.__dirty = None
+
+        angle = math.degrees(math.atan2(y, x) - math.pi/2)
+        step = round(angle / self.resolution)
+
+        offset_y, offset_x, icon = get_rotated_icon(
+            get_icon_name(thrust, level), step, self.resolution)
+
+        top = int(self.canvas.shape[0] - position_y * PIXELS_PER_METER_Y) - \
+            self.icon_shape[0] // 2 - GROUND_HEIGHT + offset_y
+        left = int((position_x + 11) * PIXELS_PER_METER_X) - \
+            self.icon_shape[1] // 2 + offset_x
+
+        # Clipping the sprite to the canvas
+        bottom = min(top + icon.shape[0], self.canvas.shape[0])
+        right = min(left + icon.shape[1], self.canvas.shape[1])
+        icon_top = max(-top, 0)
+        icon_left = max(-left, 0)
+        top = max(top, 0)
+        left = max(left, 0)
+
+        if bottom <= top or right <= left:
+            return self.canvas
+
+        region = self.canvas[top:bottom, left:right]
+        cv2.add(region, icon[icon_top:icon_top + bottom - top,
+                             icon_left:icon_left + right - left], dst=region)
+
+        self.__dirty = (top, bottom, left, right)
+
+        return self.canvas
+
+    def draw_snapshot(self, state):
+        """!
+        Draws the rocket described by a state snapshot.
+
+        @param state (ndarray): State laid out as SNAPSHOT_FIELDS
+
+        @return ndarray: canvas, overwritten by the next frame
+        """
+
+        return self.draw(state[0], state[1], state[5], state[6], state[10], state[9])
+
+    def show(self, delay):
+        """!
+        Displays the canvas in a window, scaled down to fit the screen.
+
+        @param delay (float): Time to wait for in seconds
+        """
+
+        shape = (int(self.canvas.shape[1] / 2.5), int(self.canvas.shape[0] / 2.5))
+
+        if self.__window is None:
+            self.__window = np.empty((shape[1], shape[0], 3), dtype=np.uint8)
+
+        cv2.resize(self.canvas, shape, dst=self.__window,
+                   interpolation=cv2.INTER_AREA)
+        cv2.imshow("Rocket landing", self.__window)
+        cv2.waitKey(max(int(1000*delay), 1))
+
+
+class PixelRenderer():
+    """!
+    Rasterizes many rockets at once into low-resolution images,
+    e.g. to be used as observations of convolutional policies.
+    Uses the same sprites and screen coordinates as Renderer, scaled down.
+    Scaled sprites are cached for quantized angles and added
+    to all the images with a single indexed write.
+    """
+
+    def __init__(self, width=84, height=84, resolution=2.0):
+        """!
+        Constructs the renderer.
+
+        @param width (int): Width of the images in pixels
+        @param height (int): Height of the images in pixels
+        @param resolution (float): Angle between the cached rotations of the sprites in degrees
+        """
+
+        self.width = width
+        self.height = height
+        self.resolution = resolution
+
+        background = get_background()
+        self.scale_x = width / background.shape[1]
+        self.scale_y = height / background.shape[0]
+        self.canvas_height = background.shape[0]
+
+        self.background = cv2.resize(
+            background, (width, height), interpolation=cv2.INTER_AREA)
+
+        self.icon_shape = get_icons()["idle"].shape
+        self.sprite_shape = (max(round(self.icon_shape[0] * self.scale_y), 1),
+                             max(round(self.icon_shape[1] * self.scale_x), 1))
+
+        # Sprites are scaled lazily, the first time their rotation is drawn
+        self.steps = round(360 / resolution)
+        self.__sprites = np.zeros(
+            (len(ICON_NAMES), self.steps) + self.sprite_shape + (3,), dtype=np.uint8)
+        self.__masks = np.zeros(
+            (len(ICON_NAMES), self.steps) + self.sprite_shape, dtype=bool)
+        self.__ready = np.zeros((len(ICON_NAMES), self.steps), dtype=bool)
+
+    def draw(self, position_x, position_y, x, y, thrust, level, out=None):
+        """!
+        Draws the rockets described by their physical states.
+
+        @param position_x (ndarray): Horizontal positions of the rockets
+        @param position_y (ndarray): Vertical positions of the rockets
+        @param x (ndarray): x components of the rockets' directions
+        @param y (ndarray): y components of the rockets' directions
+        @param thrust (ndarray): Current thrusts of the engines
+        @param level (ndarray): Current rotations of the TVC mounts
+        @param out (ndarray): Contiguous (N, H, W, 3) buffer to draw to. A new one is allocated by default.
+
+        @return ndarray: (N, H, W, 3) uint8 BGR images
+        """
+
+        position_x, position_y, x, y, thrust, level = np.broadcast_arrays(
+            position_x, position_y, x, y, thrust, level)
+
+        n = len(position_x)
+        sprite_height, sprite_width = self.sprite_shape
+
+        if out is None:
+            out = np.empty((n, self.height, self.width, 3), dtype=np.uint8)
+
+        out[:] = self.background
+
+        # Same choice of the sprite as in get_icon_name
+        icon = np.where(thrust == 0, ICON_NAMES.index("idle"),
+                        np.where(np.abs(level) < 0.01, ICON_NAMES.index("middle"),
+                                 np.where(level < 0, ICON_NAMES.index("left"), ICON_NAMES.index("right"))))
+
+        angle = np.degrees(np.arctan2(y, x) - math.pi/2)
+        step = np.rint(angle / self.resolution).astype(np.int64) % self.steps
+
+        self.__prepare(icon, step)
+
+        # Same mapping as in Renderer, scaled down
+        top = np.floor(self.canvas_height - position_y * PIXELS_PER_METER_Y) - \
+            self.icon_shape[0] // 2 - GROUND_HEIGHT
+        left = np.floor((position_x + 11) * PIXELS_PER_METER_X) - \
+            self.icon_shape[1] // 2
+
+        top = np.clip(np.rint(top * self.scale_y), -sprite_height,
+                      self.height).astype(np.int64)
+        left = np.clip(np.rint(left * self.scale_x), -sprite_width,
+                       self.width).astype(np.int64)
+
+        rows = top[:, None] + np.arange(sprite_height)
+        columns = left[:, None] + np.arange(sprite_width)
+
+        # Only the visible, non-black pixels of the sprites are added
+        visible = self.__masks[icon, step] & \
+            ((rows >= 0) & (rows < self.height))[:, :, None] & \
+            ((columns >= 0) & (columns < self.width))[:, None, :]
+
+        pixels = ((np.arange(n)[:, None, None] * self.height + rows[:, :, None])
+                  * self.width + columns[:, None, :])[visible]
+
+        image = out.reshape(-1, 3)
+        region = np.take(image, pixels, axis=0).astype(np.uint16)
+        region += self.__sprites[icon, step][visible]
+        image[pixels] = np.minimum(region, 255)
+
+        return out
+
+    def draw_snapshots(self, states, out=None):
+        """!
+        Draws the rockets described by state snapshots.
+
+        @param states (ndarray): (N, len(SNAPSHOT_FIELDS)) states
+        @param out (ndarray): (N, H, W, 3) buffer to draw to. A new one is allocated by default.
+
+        @return ndarray: (N, H, W, 3) uint8 BGR images
+        """
+
+        states = np.atleast_2d(states)
+
+        return self.draw(states[:, 0], states[:, 1], states[:, 5], states[:, 6], states[:, 10], states[:, 9], out)
+
+    def __prepare(self, icon, step):
+        """!
+        Scales the sprites with rotations that have not been drawn yet.
+
+        @param icon (ndarray): Indices of the sprites in ICON_NAMES
+        @param step (ndarray): Rotations of the sprites in multiples of the resolution
+        """
+
+        missing = ~self.__ready[icon, step]
+        if not missing.any():
+            return
+
+        for i, s in set(zip(icon[missing].tolist(), step[missing].tolist())):
+            sprite = get_icons()[ICON_NAMES[i]]
+
+            rot_mat = cv2.getRotationMatrix2D(
+                (sprite.shape[1]//2, sprite.shape[0]//2), s * self.resolution, 1.0)
+            rotated = cv2.warpAffine(sprite, rot_mat, sprite.shape[1::-1], flags=cv2.INTER_LINEAR,
+                                     borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+
+            self.__sprites[i, s] = cv2.resize(
+                rotated, self.sprite_shape[::-1], interpolation=cv2.INTER_AREA)
+            self.__masks[i, s] = self.__sprites[i, s].any(axis=2)
+            self.__ready[i, s] = True
+
+
+def close_windows():
+    """!
+    Destroys all windows.
+    """
+
+    cv2.destroyAllWindows()
+    cv2.waitKey(1)
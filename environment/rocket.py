@@ -1,27 +1,123 @@
 import math
-import cv2
-import os
+import numpy as np
 
 from .vector import Vector
 from .constants import *
 
+# Rotation used to get the axis perpendicular to the rocket
+COS_HALF_PI = math.cos(math.pi / 2)
+SIN_HALF_PI = math.sin(math.pi / 2)
+
 
 class FlightLog():
-    def __init__(self):
-        self.position_x = []
-        self.position_y = []
+    """!
+    Flight data of a single episode.
+    Data is stored in preallocated NumPy columns, which grow when needed.
+    Angles are stored in radians and converted to degrees when read.
+    """
+
+    COLUMNS = 10
+
+    def __init__(self, level=LogLevel.FULL, every=1, capacity=1024):
+        """!
+        Constructs an empty flight log.
 
-        self.velocity_x = []
-        self.velocity_y = []
+        @param level (LogLevel): Which steps are logged
+        @param every (int): Logs every k-th step when the level is DECIMATED
+        @param capacity (int): Number of steps to allocate space for
+        """
+
+        self.__data = np.empty((capacity, FlightLog.COLUMNS))
+        self.set_level(level, every)
+        self.clear()
+
+    def set_level(self, level, every=1):
+        """!
+        Changes which steps are logged.
+
+        @param level (LogLevel): Which steps are logged
+        @param every (int): Logs every k-th step when the level is DECIMATED
+        """
+
+        self.level = level
+        self.every = every
+
+    def clear(self):
+        """!
+        Removes all the logged data, keeping the allocated space.
+        """
+
+        self.__length = 0
+        self.__steps = 0
+
+    def record(self, rocket, tvc, time, terminal=False):
+        """!
+        Logs the flight data, if the log level asks for it.
+
+        @param rocket (Rocket): Rocket to log
+        @param tvc (TVC): TVC object to log
+        @param time (float): current timestep
+        @param terminal (bool): Whether it is the last step of the episode
+        """
 
-        self.angular_velocity = []
+        step = self.__steps
+        self.__steps += 1
 
-        self.rocket_angle = []
+        if self.level == LogLevel.OFF:
+            return
+        if self.level == LogLevel.TERMINAL and not terminal:
+            return
+        if self.level == LogLevel.DECIMATED and step % self.every != 0 and not terminal:
+            return
 
-        self.tvc_angle = []
-        self.tvc_thrust = []
+        if self.__length == len(self.__data):
+            self.__data = np.resize(
+                self.__data, (2 * len(self.__data), FlightLog.COLUMNS))
 
-        self.time = []
+        self.__data[self.__length] = (rocket.position_x, rocket.position_y,
+                                      rocket.velocity_x, rocket.velocity_y,
+                                      rocket.angular_velocity, rocket.x, rocket.y,
+                                      tvc.level, tvc.current_thrust, time)
+        self.__length += 1
+
+    def __len__(self):
+        return self.__length
+
+    @property
+    def position_x(self):
+        return self.__data[:self.__length, 0]
+
+    @property
+    def position_y(self):
+        return self.__data[:self.__length, 1]
+
+    @property
+    def velocity_x(self):
+        return self.__data[:self.__length, 2]
+
+    @property
+    def velocity_y(self):
+        return self.__data[:self.__length, 3]
+
+    @property
+    def angular_velocity(self):
+        return np.degrees(self.__data[:self.__length, 4])
+
+    @property
+    def rocket_angle(self):
+        return np.degrees(np.arctan(self.__data[:self.__length, 5] / self.__data[:self.__length, 6]))
+
+    @property
+    def tvc_angle(self):
+        return np.degrees(self.__data[:self.__length, 7])
+
+    @property
+    def tvc_thrust(self):
+        return self.__data[:self.__length, 8]
+
+    @property
+    def time(self):
+        return self.__data[:self.__length, 9]
 
 
 class Rocket(Vector):
@@ -30,16 +126,42 @@ class Rocket(Vector):
     Note that rocket is seperate from the TVC mount.
     """
 
-    def __init__(self, x, y, weight, moment_of_inertia, center_of_mass, dir_x=0, dir_y=1):
+    __slots__ = ("position_x", "position_y", "velocity_x", "velocity_y",
+                 "angular_velocity", "weight", "moment_of_inertia", "center_of_mass",
+                 "flight_log")
+
+    def __init__(self, x, y, weight, moment_of_inertia, center_of_mass, dir_x=0, dir_y=1, log_level=LogLevel.FULL, log_every=1):
         """!
         Constructs the rocket object.
 
         @param y (float): Starting Y coordinate (height) of the rocket in 3D space.
         @param weight (float): Weight of the rocket in kg.
+        @param log_level (LogLevel): Which steps of the flight are logged
+        @param log_every (int): Logs every k-th step when the level is DECIMATED
         """
 
         super(Rocket, self).__init__(x=dir_x, y=dir_y)
 
+        self.weight = weight
+        self.moment_of_inertia = moment_of_inertia
+        self.center_of_mass = center_of_mass
+
+        self.flight_log = FlightLog(log_level, log_every)
+
+        self.reset(x, y, dir_x=dir_x, dir_y=dir_y)
+
+    def reset(self, x, y, dir_x=0, dir_y=1):
+        """!
+        Puts the rocket back at a starting position, at rest.
+
+        @param x (float): Starting X coordinate of the rocket
+        @param y (float): Starting Y coordinate (height) of the rocket
+        @param dir_x (float): x component of the rocket's direction
+        @param dir_y (float): y component of the rocket's direction
+        """
+
+        self.set_direction(dir_x, dir_y)
+
         self.position_x = x
         self.position_y = y
 
@@ -48,92 +170,179 @@ class Rocket(Vector):
 
         self.angular_velocity = 0
 
-        self.weight = weight
-        self.moment_of_inertia = moment_of_inertia
-        self.center_of_mass = center_of_mass
+        self.flight_log.clear()
 
-        self.flight_log = FlightLog()
+    @property
+    def icon_idle(self):
+        from .renderer import get_icons
+        return get_icons()["idle"]
 
-        rocket_width = 250
+    @property
+    def icon_mid(self):
+        from .renderer import get_icons
+        return get_icons()["middle"]
 
-        self.icon_idle = cv2.imread(os.path.join(
-            os.path.dirname(os.path.realpath(__file__)), "img/rocket_idle.png"))
-        self.icon_idle = cv2.resize(
-            self.icon_idle, (rocket_width, rocket_width))
+    @property
+    def icon_right(self):
+        from .renderer import get_icons
+        return get_icons()["right"]
 
-        self.icon_mid = cv2.imread(os.path.join(
-            os.path.dirname(os.path.realpath(__file__)), "img/rocket_middle.png"))
-        self.icon_mid = cv2.resize(self.icon_mid, (rocket_width, rocket_width))
+    @property
+    def icon_left(self):
+        from .renderer import get_icons
+        return get_icons()["left"]
 
-        self.icon_right = cv2.imread(os.path.join(
-            os.path.dirname(os.path.realpath(__file__)), "img/rocket_right.png"))
-        self.icon_right = cv2.resize(
-            self.icon_right, (rocket_width, rocket_width))
-
-        self.icon_left = cv2.imread(os.path.join(
-            os.path.dirname(os.path.realpath(__file__)), "img/rocket_left.png"))
-        self.icon_left = cv2.resize(
-            self.icon_left, (rocket_width, rocket_width))
-
-    def update_position(self, tvc):
+    def update_position(self, tvc, timestep=TIMESTEP, integrator=Integrator.SEMI_IMPLICIT_EULER):
         """!
         Updates the rocket position
         based on TVC's configuration.
         Note that this function also updates the TVC position
 
         @param tvc (Object): TVC object used to alter rocket's trajectory
+        @param timestep (float): Length of the integration step in seconds
+        @param integrator (Integrator): Integration scheme
         """
 
-        along, side = self.get_rotated_vectors()
-
-        # Updating rocket's position
-        push_force = tvc.current_thrust * tvc.get_component_along_vector(along)
+        # Same as get_rotated_vectors, without creating new vectors
+        length = Vector.get_length(self.x, self.y)
+        along_x = self.x / length
+        along_y = self.y / length
+
+        side_x = along_x * COS_HALF_PI - along_y * SIN_HALF_PI
+        side_y = along_x * SIN_HALF_PI + along_y * COS_HALF_PI
+        length = Vector.get_length(side_x, side_y)
+        side_x /= length
+        side_y /= length
+
+        # TVC rotates together with the rocket, so both forces
+        # stay constant during the step
+        push_force = tvc.current_thrust * \
+            (tvc.x * along_x + tvc.y * along_y)
         rotate_force = tvc.current_thrust * \
-            tvc.get_component_along_vector(side)
+            (tvc.x * side_x + tvc.y * side_y)
 
-        self.velocity_x += TIMESTEP * (along.x * push_force) / self.weight
+        angular_acceleration = self.center_of_mass * \
+            rotate_force / self.moment_of_inertia
 
-        self.velocity_y -= TIMESTEP * GRAVITY
-        self.velocity_y += TIMESTEP * (along.y * push_force) / self.weight
+        if integrator == Integrator.RK4:
+            angle = self.__update_position_rk4(
+                along_x, along_y, push_force, angular_acceleration, timestep)
+        else:
+            angle = self.__update_position_semi_implicit_euler(
+                along_x, along_y, push_force, angular_acceleration, timestep)
 
-        self.position_x += TIMESTEP * self.velocity_x
-        self.position_y += TIMESTEP * self.velocity_y
+        cos = math.cos(angle)
+        sin = math.sin(angle)
 
-        # Updating rocket's rotation
-        angular_acceleration = self.center_of_mass * \
-            rotate_force / self.moment_of_inertia
+        self.rotate_by(cos, sin)
+        tvc.rotate_by(cos, sin)
 
+    def __update_position_semi_implicit_euler(self, along_x, along_y, push_force, angular_acceleration, timestep):
+        """!
+        Updates the velocities first and then moves the rocket with the new velocities.
+
+        @param along_x (float): x component of the rocket's axis
+        @param along_y (float): y component of the rocket's axis
+        @param push_force (float): Force along the rocket's axis
+        @param angular_acceleration (float): Angular acceleration of the rocket
+        @param timestep (float): Length of the integration step in seconds
+
+        @return float: angle the rocket rotates by
+        """
+
+        # Updating rocket's position
+        self.velocity_x += timestep * (along_x * push_force) / self.weight
+
+        self.velocity_y -= timestep * GRAVITY
+        self.velocity_y += timestep * (along_y * push_force) / self.weight
+
+        self.position_x += timestep * self.velocity_x
+        self.position_y += timestep * self.velocity_y
+
+        # Updating rocket's rotation
         angular_acceleration = round(angular_acceleration, 5)
 
-        self.angular_velocity += TIMESTEP * angular_acceleration
+        self.angular_velocity += timestep * angular_acceleration
 
-        self.rotate_around_z(TIMESTEP * self.angular_velocity)
-        tvc.rotate_around_z(TIMESTEP * self.angular_velocity)
+        return timestep * self.angular_velocity
 
-    def log(self, tvc, time):
+    def __update_position_rk4(self, along_x, along_y, push_force, angular_acceleration, timestep):
         """!
-        Logs the flight data for later preview
+        Integrates the motion with the 4th order Runge-Kutta method.
+        Angular acceleration is constant during the step, so the rotation
+        is known exactly and the thrust direction follows it.
 
-        @param tvc (TVC): TVC object to log
-        @param time (float): current timestep
+        @param along_x (float): x component of the rocket's axis
+        @param along_y (float): y component of the rocket's axis
+        @param push_force (float): Force along the rocket's axis
+        @param angular_acceleration (float): Angular acceleration of the rocket
+        @param timestep (float): Length of the integration step in seconds
+
+        @return float: angle the rocket rotates by
+        """
+
+        acceleration = push_force / self.weight
+
+        def get_acceleration(time):
+            angle = time * self.angular_velocity + \
+                angular_acceleration * time * time / 2
+            cos = math.cos(angle)
+            sin = math.sin(angle)
+
+            return acceleration * (along_x * cos - along_y * sin), \
+                acceleration * (along_x * sin + along_y * cos) - GRAVITY
+
+        start_x, start_y = get_acceleration(0)
+        middle_x, middle_y = get_acceleration(timestep / 2)
+        end_x, end_y = get_acceleration(timestep)
+
+        self.position_x += timestep * self.velocity_x + \
+            timestep * timestep * (start_x + 2 * middle_x) / 6
+        self.position_y += timestep * self.velocity_y + \
+            timestep * timestep * (start_y + 2 * middle_y) / 6
+
+        self.velocity_x += timestep * (start_x + 4 * middle_x + end_x) / 6
+        self.velocity_y += timestep * (start_y + 4 * middle_y + end_y) / 6
+
+        angle = timestep * self.angular_velocity + \
+            angular_acceleration * timestep * timestep / 2
+
+        self.angular_velocity += timestep * angular_acceleration
+
+        return angle
+
+    def coast(self, tvc, time):
+        """!
+        Moves the rocket with its engine turned off.
+        Uses the exact solution of the ballistic flight
+        under gravity with constant angular velocity.
+
+        @param tvc (Object): TVC object rotating together with the rocket
+        @param time (float): Time of the flight in seconds
         """
 
-        self.flight_log.position_x.append(self.position_x)
-        self.flight_log.position_y.append(self.position_y)
+        self.position_x += time * self.velocity_x
+        self.position_y += time * self.velocity_y - GRAVITY * time * time / 2
 
-        self.flight_log.velocity_x.append(self.velocity_x)
-        self.flight_log.velocity_y.append(self.velocity_y)
+        self.velocity_y -= time * GRAVITY
 
-        self.flight_log.angular_velocity.append(
-            math.degrees(self.angular_velocity))
+        angle = time * self.angular_velocity
+        cos = math.cos(angle)
+        sin = math.sin(angle)
 
-        self.flight_log.rocket_angle.append(
-            math.degrees(self.get_signed_angle_with_y_axis()))
+        self.rotate_by(cos, sin)
+        tvc.rotate_by(cos, sin)
 
-        self.flight_log.tvc_angle.append(math.degrees(tvc.level))
-        self.flight_log.tvc_thrust.append(tvc.current_thrust)
+    def log(self, tvc, time, terminal=False):
+        """!
+        Logs the flight data for later preview
+
+        @param tvc (TVC): TVC object to log
+        @param time (float): current timestep
+        @param terminal (bool): Whether it is the last step of the episode
+        """
 
-        self.flight_log.time.append(time)
+        self.flight_log.record(self, tvc, time, terminal)
 
     def get_unsigned_angle_with_y_axis(self):
         """!
@@ -1,3 +1,5 @@
+import math
+
 from .vector import Vector
 from .constants import *
 
@@ -7,6 +9,12 @@ class TVC(Vector):
     Implements a thrust-vector control for the rocket.
     """
 
+    __slots__ = ("max_thrust", "tvc_range", "current_thrust",
+                 "level", "rotations")
+
+    # Cosines and sines of the mount rotations, per range
+    __rotation_tables = {}
+
     def __init__(self, max_thrust, tvc_range, dir_x=0, dir_y=1):
         """!
         Constructs the TVC mount
@@ -20,10 +28,41 @@ class TVC(Vector):
         self.max_thrust = max_thrust
         self.tvc_range = tvc_range
 
+        self.rotations = TVC.get_rotation_table(tvc_range)
+
+        self.reset(dir_x=dir_x, dir_y=dir_y)
+
+    def reset(self, dir_x=0, dir_y=1):
+        """!
+        Centers the mount and turns off the engine.
+
+        @param dir_x (float): x component of the rocket's direction
+        @param dir_y (float): y component of the rocket's direction
+        """
+
+        self.set_direction(dir_x, dir_y)
+
         self.current_thrust = 0
 
         self.level = 0
 
+    @staticmethod
+    def get_rotation_table(tvc_range):
+        """!
+        Precomputes the rotations the mount can make.
+        The mount always turns by one or two multiples of its range.
+
+        @param tvc_range (float): Range of the mount in radians
+
+        @return dict: (cosine, sine) of the rotation for each multiple of the range
+        """
+
+        if tvc_range not in TVC.__rotation_tables:
+            TVC.__rotation_tables[tvc_range] = {
+                k: (math.cos(tvc_range * k), math.sin(tvc_range * k)) for k in (-2, -1, 1, 2)}
+
+        return TVC.__rotation_tables[tvc_range]
+
     def stay_thrust(self):
         """!
         Leaves the thrust of the engine as it is.
@@ -37,10 +76,10 @@ class TVC(Vector):
         """
 
         if self.level > 0.1:
-            self.rotate_around_z(-self.tvc_range * 2)
+            self.rotate_by(*self.rotations[-2])
             self.level -= self.tvc_range * 2
         elif self.level > -0.1:
-            self.rotate_around_z(-self.tvc_range)
+            self.rotate_by(*self.rotations[-1])
             self.level -= self.tvc_range
 
     def set_rotation_right(self):
@@ -49,10 +88,10 @@ class TVC(Vector):
         """
 
         if self.level < -0.1:
-            self.rotate_around_z(self.tvc_range * 2)
+            self.rotate_by(*self.rotations[2])
             self.level += self.tvc_range * 2
         elif self.level < 0.1:
-            self.rotate_around_z(self.tvc_range)
+            self.rotate_by(*self.rotations[1])
             self.level += self.tvc_range
 
     def set_rotation_middle(self):
@@ -61,10 +100,10 @@ class TVC(Vector):
         """
 
         if self.level > 0.1:
-            self.rotate_around_z(-self.tvc_range)
+            self.rotate_by(*self.rotations[-1])
             self.level -= self.tvc_range
         elif self.level < -0.1:
-            self.rotate_around_z(self.tvc_range)
+            self.rotate_by(*self.rotations[1])
             self.level += self.tvc_range
 
     def set_max_thrust(self):
@@ -7,6 +7,8 @@ class Vector():
     such as rotation and translation.
     """
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x=0, y=1):
         """!
         Initializes a Vector.
@@ -18,6 +20,16 @@ class Vector():
         @param y (float): z component of the vector. Default: 0
         """
 
+        self.set_direction(x, y)
+
+    def set_direction(self, x, y):
+        """!
+        Points the vector in a new direction.
+
+        @param x (float): x component of the vector
+        @param y (float): y component of the vector
+        """
+
         self.x = x
         self.y = y
 
@@ -30,8 +42,19 @@ class Vector():
         @param angle (float): Angle in radians
         """
 
-        temp_x = self.x * math.cos(angle) - self.y * math.sin(angle)
-        self.y = self.x * math.sin(angle) + self.y * math.cos(angle)
+        self.rotate_by(math.cos(angle), math.sin(angle))
+
+    def rotate_by(self, cos, sin):
+        """!
+        Rotates the vector around z axis by an angle
+        given with its precomputed cosine and sine.
+
+        @param cos (float): Cosine of the angle
+        @param sin (float): Sine of the angle
+        """
+
+        temp_x = self.x * cos - self.y * sin
+        self.y = self.x * sin + self.y * cos
 
         self.x = temp_x
 
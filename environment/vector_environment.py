@@ -0,0 +1,520 @@
+import math
+import numpy as np
+
+from .environment import Curriculum
+from .rocket import COS_HALF_PI, SIN_HALF_PI
+from .tvc import TVC
+from .constants import *
+
+
+class VectorEnvironment():
+    """!
+    Batched version of the environment.
+    Keeps the state of N rockets in NumPy arrays and advances
+    all of them with a single call. Physics, reward and termination
+    rules are the same as in the Environment, for any timestep,
+    number of substeps and integrator.
+    """
+
+    def __init__(self, num_envs, auto_reset=True, pixels=False, pixel_shape=(84, 84), dt=TIMESTEP, substeps=1, integrator=Integrator.SEMI_IMPLICIT_EULER):
+        """!
+        Constructs the batched environment.
+
+        @param num_envs (int): Number of rockets simulated at once
+        @param auto_reset (bool): Whether finished rockets are reset automatically after a step
+        @param pixels (bool): Whether the observations are images instead of state vectors
+        @param pixel_shape (tuple): Height and width of the images
+        @param dt (float): Length of a single timestep in seconds
+        @param substeps (int): Number of integration steps per timestep
+        @param integrator (Integrator): Integration scheme of the physics engine
+        """
+
+        self.num_envs = num_envs
+        self.auto_reset = auto_reset
+
+        self.dt = dt
+        self.substeps = substeps
+        self.integrator = integrator
+
+        self.pixels = pixels
+        self.pixel_shape = pixel_shape
+        self.__pixel_renderer = None
+
+        self.curriculum = Curriculum()
+
+        self.position_x = np.zeros(num_envs)
+        self.position_y = np.zeros(num_envs)
+
+        self.velocity_x = np.zeros(num_envs)
+        self.velocity_y = np.zeros(num_envs)
+
+        self.angular_velocity = np.zeros(num_envs)
+
+        # Orientation of the rocket and of the TVC mount as unit vectors
+        self.x = np.zeros(num_envs)
+        self.y = np.ones(num_envs)
+        self.tvc_x = np.zeros(num_envs)
+        self.tvc_y = np.ones(num_envs)
+
+        self.tvc_level = np.zeros(num_envs)
+        self.tvc_thrust = np.zeros(num_envs)
+
+        self.timestep = np.zeros(num_envs)
+
+        self.__tvc_rotations = TVC.get_rotation_table(MAX_ROTATION)
+
+        self.np_random = np.random.default_rng()
+
+        self.reset()
+
+    def reset(self, mask=None, seed=None, out=None):
+        """!
+        Resets the selected rockets to conditions defined
+        by curriculum and predefined constants
+
+        @param mask (ndarray): Boolean mask of rockets to reset. Resets all of them by default.
+        @param seed (int): Seed of the batch's random number generator.
+                           The generator is left as it is by default.
+        @param out (ndarray): buffer to write the observations to
+
+        @return ndarray: (N, 5) current state of the environments,
+                         or (N, H, W, 3) images in the pixel mode
+        """
+
+        if seed is not None:
+            self.np_random = np.random.default_rng(seed)
+
+        if mask is None:
+            indices = slice(None)
+            n = self.num_envs
+        else:
+            indices = np.flatnonzero(mask)
+            n = len(indices)
+
+        start_position, start_height, start_dx, start_dy = \
+            self.curriculum.sample_initial_conditions(n, self.np_random)
+
+        length = np.sqrt(start_dx * start_dx + start_dy * start_dy)
+
+        self.position_x[indices] = start_position
+        self.position_y[indices] = start_height
+        self.velocity_x[indices] = 0
+        self.velocity_y[indices] = 0
+        self.angular_velocity[indices] = 0
+
+        self.x[indices] = self.tvc_x[indices] = start_dx / length
+        self.y[indices] = self.tvc_y[indices] = start_dy / length
+
+        self.tvc_level[indices] = 0
+        self.tvc_thrust[indices] = 0
+
+        self.timestep[indices] = 0
+
+        return self.__observe(out)
+
+    def step(self, actions, repeat=1, out=None):
+        """!
+        Updates all the environments for one or more timesteps.
+
+        @param actions (ndarray): (N,) actions to take, one per rocket
+        @param repeat (int): Number of timesteps the actions are repeated for.
+                             Finished rockets stop moving.
+        @param out (ndarray): buffer to write the observations to
+
+        @return ndarray: (N, 5) newly observed states of the environments,
+                         or (N, H, W, 3) images in the pixel mode
+        @return ndarray: (N,) sampled rewards, summed over the repeated timesteps
+        @return ndarray: (N,) whether or not each simulation is finished
+        @return dict: additional information. If auto reset is enabled,
+                      "final_observation" holds the states observed before the reset.
+        """
+
+        actions = np.asarray(actions)
+
+        self.__apply_actions(actions)
+
+        reward = np.zeros(self.num_envs)
+        done = np.zeros(self.num_envs, dtype=bool)
+
+        rows = slice(None)
+        for _ in range(repeat):
+            step_reward, step_done = self.__simulate(rows)
+            reward[rows] += step_reward
+            done[rows] = step_done
+
+            if step_done.any():
+                rows = np.flatnonzero(~done)
+                if len(rows) == 0:
+                    break
+
+        state = self.__observe(out)
+        info = {}
+
+        if self.auto_reset and done.any():
+            info["final_observation"] = state.copy()
+            state = self.reset(done, out=state)
+
+        return state, reward, done, info
+
+    def get_state_snapshot(self, indices=None):
+        """!
+        Captures the physical states of the selected rockets.
+        Rows follow the same layout as Environment's snapshots (SNAPSHOT_FIELDS).
+
+        @param indices (ndarray): Rockets to capture. Captures all of them by default.
+
+        @return ndarray: (B, len(SNAPSHOT_FIELDS)) captured states
+        """
+
+        if indices is None:
+            indices = slice(None)
+
+        states = np.stack((self.position_x[indices], self.position_y[indices],
+                           self.velocity_x[indices], self.velocity_y[indices],
+                           self.angular_velocity[indices], self.x[indices], self.y[indices],
+                           self.tvc_x[indices], self.tvc_y[indices], self.tvc_level[indices],
+                           self.tvc_thrust[indices], self.timestep[indices]), axis=1)
+
+        curriculum_max = getattr(self.curriculum, "max", math.nan)
+
+        return np.concatenate((states, np.full((len(states), 1), curriculum_max)), axis=1)
+
+    def restore_state_snapshot(self, states, indices=None, out=None):
+        """!
+        Brings the selected rockets back to captured states.
+        A single state, e.g. Environment's snapshot, is copied to all the selected rockets,
+        which makes it easy to branch a simulation. Snapshots do not record the timestep
+        or the integrator, so the branches only follow the original flight if
+        dt, substeps and integrator are the same as in the captured environment.
+        All the rockets share the curriculum, which is restored from the first state.
+
+        @param states (ndarray): (B, len(SNAPSHOT_FIELDS)) or (len(SNAPSHOT_FIELDS),) captured states
+        @param indices (ndarray): Rockets to restore. Restores all of them by default.
+        @param out (ndarray): buffer to write the observations to
+
+        @return ndarray: (N, 5) current states of the environments,
+                         or (N, H, W, 3) images in the pixel mode
+        """
+
+        if indices is None:
+            indices = slice(None)
+
+        states = np.atleast_2d(states)
+
+        (self.position_x[indices], self.position_y[indices],
+         self.velocity_x[indices], self.velocity_y[indices],
+         self.angular_velocity[indices], self.x[indices], self.y[indices],
+         self.tvc_x[indices], self.tvc_y[indices], self.tvc_level[indices],
+         self.tvc_thrust[indices], self.timestep[indices]) = states[:, :-1].T
+
+        if not math.isnan(states[0, -1]):
+            self.curriculum.max = states[0, -1]
+
+        return self.__observe(out)
+
+    def __apply_actions(self, actions):
+        """!
+        Moves the TVC mounts and sets the thrust
+        according to the chosen actions.
+
+        @param actions (ndarray): (N,) actions to take
+        """
+
+        level = self.tvc_level
+
+        left = actions == Action.LEFT
+        middle = actions == Action.MIDDLE
+        right = actions == Action.RIGHT
+
+        # Number of MAX_ROTATION steps the mount turns by
+        turn = np.zeros(self.num_envs, dtype=np.int64)
+        turn[left & (level > 0.1)] = -2
+        turn[left & (level <= 0.1) & (level > -0.1)] = -1
+        turn[right & (level < -0.1)] = 2
+        turn[right & (level >= -0.1) & (level < 0.1)] = 1
+        turn[middle & (level > 0.1)] = -1
+        turn[middle & (level < -0.1)] = 1
+
+        for k in (-2, -1, 1, 2):
+            rows = turn == k
+            if not rows.any():
+                continue
+
+            x = self.tvc_x[rows]
+            y = self.tvc_y[rows]
+            self.tvc_x[rows], self.tvc_y[rows] = VectorEnvironment.__rotate(
+                x, y, *self.__tvc_rotations[k])
+            self.tvc_level[rows] += k * MAX_ROTATION
+
+        self.tvc_thrust = np.where(actions == Action.NOTHING, 0, MAX_THRUST)
+
+    def __simulate(self, rows):
+        """!
+        Moves the selected rockets by a single timestep.
+        The timestep is split into substeps, and every rocket stops
+        at the first substep that finishes its simulation.
+
+        @param rows (slice or ndarray): Rockets to move
+
+        @return ndarray: sampled rewards of the selected rockets
+        @return ndarray: whether or not the selected simulations are finished
+        """
+
+        substep = self.dt / self.substeps
+        moving = rows
+
+        for i in range(self.substeps):
+            self.__update_positions(moving, substep)
+
+            if i == self.substeps - 1:
+                break
+
+            finished = (self.position_y[moving] <= 0) | (
+                np.abs(self.position_x[moving]) > 10)
+
+            if finished.any():
+                moving = np.arange(self.num_envs)[moving][~finished]
+                if len(moving) == 0:
+                    break
+
+        position_x = self.position_x[rows]
+        position_y = self.position_y[rows]
+
+        landed = position_y <= 0
+        done = landed | (np.abs(position_x) > 10)
+
+        reward = np.full(len(position_y), -PENALTY_PER_SECOND * self.dt)
+
+        if landed.any():
+            velocity_x = self.velocity_x[rows]
+
+            landing_reward = REWARD_LANDING - np.abs(self.velocity_y[rows] + 1) - \
+                PENALTY_PER_RADIAN_AT_LANDING * np.abs(np.arctan(self.x[rows] / self.y[rows])) - \
+                PENALTY_PER_ANGULAR_VELOCITY_AT_LANDING * \
+                np.abs(self.angular_velocity[rows])
+
+            if self.curriculum.x_velocity_reward:
+                landing_reward -= PENALTY_PER_HORIZONTAL_VELOCITY * \
+                    np.abs(velocity_x)
+
+            if self.curriculum.land_at_target:
+                landing_reward -= PENALTY_PER_HORIZONTAL_POSITION * \
+                    np.abs(position_x)
+
+            reward = np.where(landed, landing_reward, reward)
+
+        self.timestep[rows] += self.dt
+
+        return reward, done
+
+    def __update_positions(self, rows, timestep):
+        """!
+        Updates the selected rockets' positions and rotations
+        based on the TVC configuration.
+
+        @param rows (slice or ndarray): Rockets to move
+        @param timestep (float): Length of the integration step in seconds
+        """
+
+        x = self.x[rows]
+        y = self.y[rows]
+        tvc_x = self.tvc_x[rows]
+        tvc_y = self.tvc_y[rows]
+        thrust = self.tvc_thrust[rows]
+
+        length = np.sqrt(x * x + y * y)
+        along_x = x / length
+        along_y = y / length
+        side_x, side_y = VectorEnvironment.__rotate(
+            along_x, along_y, COS_HALF_PI, SIN_HALF_PI)
+
+        push_force = thrust * (tvc_x * along_x + tvc_y * along_y)
+        rotate_force = thrust * (tvc_x * side_x + tvc_y * side_y)
+
+        angular_acceleration = CENTER_OF_MASS * rotate_force / MOMENT_OF_INERTIA
+
+        if self.integrator == Integrator.RK4:
+            angle = self.__update_positions_rk4(
+                rows, along_x, along_y, push_force, angular_acceleration, timestep)
+        else:
+            angle = self.__update_positions_semi_implicit_euler(
+                rows, along_x, along_y, push_force, angular_acceleration, timestep)
+
+        cos = np.cos(angle)
+        sin = np.sin(angle)
+
+        self.x[rows], self.y[rows] = VectorEnvironment.__rotate(
+            x, y, cos, sin)
+        self.tvc_x[rows], self.tvc_y[rows] = VectorEnvironment.__rotate(
+            tvc_x, tvc_y, cos, sin)
+
+    def __update_positions_semi_implicit_euler(self, rows, along_x, along_y, push_force, angular_acceleration, timestep):
+        """!
+        Updates the velocities first and then moves the rockets with the new velocities,
+        like Rocket does.
+
+        @param rows (slice or ndarray): Rockets to move
+        @param along_x (ndarray): x components of the rockets' axes
+        @param along_y (ndarray): y components of the rockets' axes
+        @param push_force (ndarray): Forces along the rockets' axes
+        @param angular_acceleration (ndarray): Angular accelerations of the rockets
+        @param timestep (float): Length of the integration step in seconds
+
+        @return ndarray: angles the rockets rotate by
+        """
+
+        velocity_x = self.velocity_x[rows]
+        velocity_y = self.velocity_y[rows]
+
+        velocity_x += timestep * (along_x * push_force) / WEIGHT
+
+        velocity_y -= timestep * GRAVITY
+        velocity_y += timestep * (along_y * push_force) / WEIGHT
+
+        self.velocity_x[rows] = velocity_x
+        self.velocity_y[rows] = velocity_y
+
+        self.position_x[rows] += timestep * velocity_x
+        self.position_y[rows] += timestep * velocity_y
+
+        angular_acceleration = np.round(angular_acceleration, 5)
+
+        angular_velocity = self.angular_velocity[rows]
+        angular_velocity += timestep * angular_acceleration
+        self.angular_velocity[rows] = angular_velocity
+
+        return timestep * angular_velocity
+
+    def __update_positions_rk4(self, rows, along_x, along_y, push_force, angular_acceleration, timestep):
+        """!
+        Integrates the motion with the 4th order Runge-Kutta method, like Rocket does.
+
+        @param rows (slice or ndarray): Rockets to move
+        @param along_x (ndarray): x components of the rockets' axes
+        @param along_y (ndarray): y components of the rockets' axes
+        @param push_force (ndarray): Forces along the rockets' axes
+        @param angular_acceleration (ndarray): Angular accelerations of the rockets
+        @param timestep (float): Length of the integration step in seconds
+
+        @return ndarray: angles the rockets rotate by
+        """
+
+        acceleration = push_force / WEIGHT
+        angular_velocity = self.angular_velocity[rows]
+
+        def get_acceleration(time):
+            angle = time * angular_velocity + \
+                angular_acceleration * time * time / 2
+            cos = np.cos(angle)
+            sin = np.sin(angle)
+
+            return acceleration * (along_x * cos - along_y * sin), \
+                acceleration * (along_x * sin + along_y * cos) - GRAVITY
+
+        start_x, start_y = get_acceleration(0)
+        middle_x, middle_y = get_acceleration(timestep / 2)
+        end_x, end_y = get_acceleration(timestep)
+
+        velocity_x = self.velocity_x[rows]
+        velocity_y = self.velocity_y[rows]
+
+        self.position_x[rows] += timestep * velocity_x + \
+            timestep * timestep * (start_x + 2 * middle_x) / 6
+        self.position_y[rows] += timestep * velocity_y + \
+            timestep * timestep * (start_y + 2 * middle_y) / 6
+
+        self.velocity_x[rows] = velocity_x + \
+            timestep * (start_x + 4 * middle_x + end_x) / 6
+        self.velocity_y[rows] = velocity_y + \
+            timestep * (start_y + 4 * middle_y + end_y) / 6
+
+        angle = timestep * angular_velocity + \
+            angular_acceleration * timestep * timestep / 2
+
+        self.angular_velocity[rows] = angular_velocity + \
+            timestep * angular_acceleration
+
+        return angle
+
+    def render_pixels(self, out=None):
+        """!
+        Rasterizes all the rockets into low-resolution images,
+        using the sprites and the screen layout of Environment.render.
+
+        @param out (ndarray): (N, H, W, 3) buffer to draw to. A new one is allocated by default.
+
+        @return ndarray: (N, H, W, 3) uint8 BGR images
+        """
+
+        if self.__pixel_renderer is None:
+            # OpenCV is only loaded once something is rendered
+            from .renderer import PixelRenderer
+            self.__pixel_renderer = PixelRenderer(
+                width=self.pixel_shape[1], height=self.pixel_shape[0])
+
+        return self.__pixel_renderer.draw(self.position_x, self.position_y, self.x, self.y,
+                                          self.tvc_thrust, self.tvc_level, out)
+
+    def __observe(self, out=None):
+        """!
+        Generates the observations of the environments.
+
+        @param out (ndarray): Buffer to write the observations to
+
+        @return ndarray: state vectors, or images in the pixel mode
+        """
+
+        if self.pixels:
+            return self.render_pixels(out)
+
+        return self.__get_state(out)
+
+    def __get_angles(self):
+        """!
+        Calculates the signed angles between the rockets and the y-axis.
+
+        @return ndarray: angles in radians
+        """
+
+        return np.arctan(self.x / self.y)
+
+    def __get_state(self, out=None):
+        """!
+        Generates vectors describing the environments
+
+        @param out (ndarray): (N, 5) buffer to write the descriptions to. A new one is allocated by default.
+
+        @return ndarray: (N, 5) description of the environments
+        """
+
+        if out is None:
+            out = np.empty((self.num_envs, OBSERVATION_SIZE), dtype=np.float32)
+
+        out[:, 0] = self.position_y
+        out[:, 1] = self.velocity_y
+        out[:, 2] = self.velocity_x
+        out[:, 3] = self.angular_velocity
+        out[:, 4] = self.__get_angles()
+
+        return out
+
+    @staticmethod
+    def __rotate(x, y, cos, sin):
+        """!
+        Rotates unit vectors around z axis, the same way Vector does.
+
+        @param x (ndarray): x components of the vectors
+        @param y (ndarray): y components of the vectors
+        @param cos (ndarray): cosine of the rotation angle
+        @param sin (ndarray): sine of the rotation angle
+
+        @return ndarray: x components of the rotated vectors
+        @return ndarray: y components of the rotated vectors
+        """
+
+        new_x = x * cos - y * sin
+        new_y = x * sin + y * cos
+
+        length = np.sqrt(new_x * new_x + new_y * new_y)
+
+        return new_x / length, new_y / length
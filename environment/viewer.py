@@ -0,0 +1,141 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import time
+
+from .environment import SNAPSHOT_FIELDS
+
+
+class Viewer():
+    """!
+    Displays the flight in a separate process.
+    The latest physical state is published through a small shared memory slot
+    guarded by a sequence counter (a seqlock). The viewer draws at its own rate
+    and skips the states it does not manage to draw, so publishing a state
+    never waits for the display.
+    """
+
+    def __init__(self, fps=30):
+        """!
+        Starts the viewer process.
+
+        @param fps (float): Maximum frame rate of the display
+        """
+
+        # Sequence counter followed by the state laid out as SNAPSHOT_FIELDS
+        self.__memory = shared_memory.SharedMemory(
+            create=True, size=8 * (1 + len(SNAPSHOT_FIELDS)))
+        self.__sequence = np.ndarray((1,), np.int64, self.__memory.buf)
+        self.__state = np.ndarray(
+            (len(SNAPSHOT_FIELDS),), np.float64, self.__memory.buf, offset=8)
+        self.__sequence[0] = 0
+
+        # Torch is not fork-safe once its thread pools are running
+        context = mp.get_context("spawn")
+
+        self.__stop = context.Event()
+        self.__process = context.Process(target=_viewer, args=(
+            self.__memory.name, fps, self.__stop), daemon=True)
+        self.__process.start()
+
+        self.closed = False
+
+    def update(self, env):
+        """!
+        Publishes the current state of an environment.
+
+        @param env (Environment): Displayed environment
+        """
+
+        self.update_state(env.get_state_snapshot().state)
+
+    def update_state(self, state):
+        """!
+        Publishes a physical state, replacing the previous one.
+
+        @param state (ndarray): State laid out as SNAPSHOT_FIELDS
+        """
+
+        # An odd counter tells the viewer that the state is being written
+        self.__sequence[0] += 1
+        self.__state[:] = state
+        self.__sequence[0] += 1
+
+    def close(self):
+        """!
+        Stops the viewer and frees the shared memory.
+        """
+
+        if self.closed:
+            return
+
+        self.__stop.set()
+        self.__process.join(timeout=1)
+        if self.__process.is_alive():
+            self.__process.terminate()
+
+        self.__sequence = self.__state = None
+        self.__memory.close()
+        self.__memory.unlink()
+
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _viewer(name, fps, stop):
+    """!
+    Main loop of the viewer process.
+
+    @param name (string): Name of the shared memory slot
+    @param fps (float): Maximum frame rate of the display
+    @param stop (Event): Set when the viewer should stop
+    """
+
+    # OpenCV is only loaded by the viewer process
+    import cv2
+    from .renderer import Renderer, close_windows
+
+    memory = shared_memory.SharedMemory(name=name)
+    sequence = np.ndarray((1,), np.int64, memory.buf)
+    shared_state = np.ndarray(
+        (len(SNAPSHOT_FIELDS),), np.float64, memory.buf, offset=8)
+
+    renderer = Renderer()
+    state = np.empty(len(SNAPSHOT_FIELDS))
+    shown = 0
+
+    while not stop.is_set():
+        start = sequence[0]
+
+        if start % 2 == 1 or start == shown:
+            time.sleep(1 / fps)
+            continue
+
+        state[:] = shared_state
+
+        # The state was overwritten while it was copied
+        if sequence[0] != start:
+            continue
+
+        renderer.draw_snapshot(state)
+
+        try:
+            renderer.show(1 / fps)
+        except cv2.error:
+            # No display available
+            break
+
+        shown = start
+
+    try:
+        close_windows()
+    except cv2.error:
+        pass
+
+    del sequence, shared_state
+    memory.close()
@@ -0,0 +1,144 @@
+"""!
+Runs a trained QNetwork with NumPy only, without importing torch.
+
+Usage:
+    python3 inference.py models/model_1900 models/model_1900.npz
+"""
+
+import argparse
+import numpy as np
+
+
+class NumpyQNetwork():
+    """!
+    Computes the Q-values of a QNetwork exported by export.
+    The network is small, so a pass through NumPy takes a few microseconds,
+    much less than the dispatch overhead of torch. A single observation
+    is computed in buffers allocated once, so an instance must not be
+    shared between threads.
+    """
+
+    def __init__(self, weights):
+        """!
+        Prepares the network.
+
+        @param weights (dict): Arrays named as in the state_dict of QNetwork, or the path of an exported .npz file
+        """
+
+        if isinstance(weights, str):
+            with np.load(weights) as file:
+                weights = dict(file)
+
+        # Transposed once, so that observations are multiplied from the left
+        self.__w1 = np.ascontiguousarray(weights["fc1.weight"].T, dtype=np.float32)
+        self.__b1 = np.asarray(weights["fc1.bias"], dtype=np.float32)
+        self.__w3 = np.ascontiguousarray(weights["fc3.weight"].T, dtype=np.float32)
+        self.__b3 = np.asarray(weights["fc3.bias"], dtype=np.float32)
+
+        self.input_dims = self.__w1.shape[0]
+        self.n_actions = self.__w3.shape[1]
+
+        self.__hidden = np.empty(self.__w1.shape[1], dtype=np.float32)
+        self.__actions = np.empty(self.n_actions, dtype=np.float32)
+
+    def feed_forward(self, states):
+        """!
+        Calculates the Q-values for each action, like QNetwork.feed_forward.
+
+        @param states (ndarray): (input_dims,) state or (N, input_dims) batch of states
+
+        @return ndarray: (n_actions,) or (N, n_actions) Q-values
+        """
+
+        states = np.asarray(states, dtype=np.float32)
+
+        if states.ndim == 1:
+            return self.__feed_forward_single(states).copy()
+
+        hidden = states @ self.__w1
+        hidden += self.__b1
+        np.tanh(hidden, out=hidden)
+
+        actions = hidden @ self.__w3
+        actions += self.__b3
+
+        return actions
+
+    def choose_action(self, observation):
+        """!
+        Chooses the action with the highest Q-value.
+
+        @param observation (ndarray): Vector describing current state
+
+        @return int: Action to take
+        """
+
+        return int(self.__feed_forward_single(np.asarray(observation, dtype=np.float32)).argmax())
+
+    def choose_actions(self, observations):
+        """!
+        Chooses the actions with the highest Q-values for a batch of observations.
+
+        @param observations (ndarray): (N, input_dims) vectors describing current states
+
+        @return ndarray: (N,) actions to take
+        """
+
+        return self.feed_forward(observations).argmax(axis=1)
+
+    def __feed_forward_single(self, state):
+        """!
+        Calculates the Q-values of a single state in the preallocated buffers.
+
+        @param state (ndarray): (input_dims,) float32 state
+
+        @return ndarray: (n_actions,) Q-values, overwritten by the next call
+        """
+
+        hidden = self.__hidden
+        actions = self.__actions
+
+        np.dot(state, self.__w1, out=hidden)
+        hidden += self.__b1
+        np.tanh(hidden, out=hidden)
+
+        np.dot(hidden, self.__w3, out=actions)
+        actions += self.__b3
+
+        return actions
+
+
+def export(state_dict, path=None):
+    """!
+    Converts the state_dict of a QNetwork to NumPy arrays.
+
+    @param state_dict (dict): Weights of the network, e.g. agent.q_eval.state_dict()
+    @param path (string): Path of the .npz file the arrays are saved to, if given
+
+    @return dict: arrays named as in the state_dict
+    """
+
+    weights = {name: value.detach().cpu().numpy().astype(np.float32)
+               for name, value in state_dict.items()}
+
+    if path is not None:
+        np.savez(path, **weights)
+
+    return weights
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog='Rocket Landing - Export a model for NumPy inference')
+
+    parser.add_argument('model',
+                        help="Path of a model saved by train.py")
+    parser.add_argument('output',
+                        help="Path of the .npz file to write")
+
+    args = parser.parse_args()
+
+    # Only exporting needs torch, to read the saved model
+    import torch
+
+    export(torch.load(args.model, map_location="cpu"), args.output)
@@ -0,0 +1,164 @@
+import copy
+import threading
+import torch as T
+
+
+class AsyncLearner():
+    """!
+    Updates the agent's network on a background thread while the main loop
+    collects experience. Torch releases the GIL while it computes,
+    so collection and learning overlap.
+    The agent acts with a separate copy of the network, q_act, which is
+    double-buffered: weights are copied to the copy not in use, which
+    then replaces the acting one.
+    The exploration rate decreases once per collected transition, like
+    with agent.learn() after every step, so the exploration schedule does
+    not depend on the number of updates per step.
+    """
+
+    def __init__(self, agent, updates_per_step=1.0, publish_every=100, max_lag=1000):
+        """!
+        Starts the learner thread.
+
+        @param agent            (Agent): Agent to train
+        @param updates_per_step (float): Update-to-data ratio, i.e. number of updates per collected transition
+        @param publish_every    (int): Number of updates after which the weights are published to q_act
+        @param max_lag          (int): Number of updates the learner can fall behind before the main loop waits for it
+        """
+
+        self.agent = agent
+        self.updates_per_step = updates_per_step
+        self.publish_every = publish_every
+        self.max_lag = max_lag
+
+        self.updates = 0
+
+        self.__buffers = [copy.deepcopy(agent.q_eval),
+                          copy.deepcopy(agent.q_eval)]
+        self.__front = 0
+        agent.q_act = self.__buffers[self.__front]
+
+        # Number of updates the learner is allowed to make
+        self.__credit = 0.0
+        self.__condition = threading.Condition()
+
+        # Held while the network is updated, e.g. to copy a consistent state of the agent
+        self.lock = threading.Lock()
+
+        self.closed = False
+        self.error = None
+
+        self.__thread = threading.Thread(target=self.__learn, daemon=True)
+        self.__thread.start()
+
+    def step(self, transitions=1):
+        """!
+        Lets the learner make updates for newly collected transitions.
+        Called instead of agent.learn() after storing them.
+
+        @param transitions (int): Number of collected transitions
+        """
+
+        with self.__condition:
+            self.__raise()
+
+            # Same condition as the synchronous agent.learn(), which skips the first steps
+            if self.agent.mem_cntr >= self.agent.batch_size:
+                self.agent.decay_exploration(transitions)
+
+            self.__credit += transitions * self.updates_per_step
+
+            # Keeping the update-to-data ratio when the learner falls behind
+            while self.__credit > self.max_lag and not self.closed and self.error is None:
+                self.__condition.notify()
+                self.__condition.wait()
+
+            self.__raise()
+            self.__condition.notify()
+
+    def publish(self):
+        """!
+        Copies the current weights to the acting network.
+        """
+
+        self.__raise()
+
+        back = self.__buffers[1 - self.__front]
+
+        with self.lock, T.no_grad():
+            back.load_state_dict(self.agent.q_eval.state_dict())
+
+        self.__front = 1 - self.__front
+        self.agent.q_act = back
+
+    def state_dict(self):
+        """!
+        Copies the weights of the trained network in between updates.
+
+        @return dict: state of the network
+        """
+
+        with self.lock:
+            return {key: value.clone() for key, value in self.agent.q_eval.state_dict().items()}
+
+    def close(self):
+        """!
+        Stops the learner thread and publishes the final weights.
+        """
+
+        if self.closed:
+            return
+
+        with self.__condition:
+            self.closed = True
+            self.__condition.notify_all()
+
+        self.__thread.join()
+
+        self.__raise()
+        self.publish()
+
+    def __learn(self):
+        """!
+        Main loop of the learner thread.
+        """
+
+        while True:
+            with self.__condition:
+                while self.__credit < 1 and not self.closed:
+                    self.__condition.wait()
+
+                if self.closed:
+                    return
+
+                self.__credit -= 1
+                self.__condition.notify()
+
+            try:
+                with self.lock:
+                    self.agent.learn(decay_exploration=False)
+
+                self.updates += 1
+
+                if self.updates % self.publish_every == 0:
+                    self.publish()
+            except Exception as error:
+                # Wakes up the training loop, which raises the error instead of waiting
+                with self.__condition:
+                    self.error = error
+                    self.__condition.notify_all()
+                return
+
+    def __raise(self):
+        """!
+        Raises the error that stopped the learner thread, if any.
+        """
+
+        if self.error is not None:
+            raise RuntimeError("The learner thread failed") from self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -3,10 +3,9 @@ import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
 import numpy as np
-import math
-import random
 
 from environment.constants import *
+from replay import ReplayBuffer, PrioritizedReplayBuffer, MemmapReplayBuffer
 
 
 class QNetwork(nn.Module):
@@ -26,7 +25,8 @@ class QNetwork(nn.Module):
         self.fc3 = nn.Linear(layer1_dims, n_actions)
 
         self.optimizer = optim.Adam(self.parameters(), lr=lr)
-        self.loss = nn.L1Loss()
+        # Errors are kept per transition, so that they can be weighted
+        self.loss = nn.L1Loss(reduction='none')
         self.device = T.device('cuda:0' if T.cuda.is_available() else 'cpu')
         self.to(self.device)
 
@@ -44,7 +44,7 @@ class QNetwork(nn.Module):
 
 
 class Agent():
-    def __init__(self, gamma, epsilon, lr, input_dims, batch_size, n_actions=4, max_mem_size=25000, exploration_min=0.01, exploration_dec=3e-4, exploration=Exploration.EPSILON_GREEDY):
+    def __init__(self, gamma, epsilon, lr, input_dims, batch_size, n_actions=4, max_mem_size=25000, exploration_min=0.01, exploration_dec=3e-4, exploration=Exploration.EPSILON_GREEDY, prioritized=False, replay_path=None):
         """!
         Initializes an Agent. 
         Note that Agent is seperate from the Deep Q Network.
@@ -59,6 +59,8 @@ class Agent():
         @param exploration_min      (float): Minimum size of epsilon in the epsilon-greedy exploration strategy
         @param exploration_dec      (float): Decrease step of epsilon in the epsilon-greedy exploration strategy
         @param exploration  (Exploration): Exploration strategy, e.g. EPSILON_GREEDY or SOFTMAX
+        @param prioritized  (bool): Whether transitions are replayed proportionally to their TD errors
+        @param replay_path  (string): Directory of a replay buffer kept in memory-mapped files, reopened if it exists
         """
 
         self.gamma = gamma
@@ -73,44 +75,80 @@ class Agent():
         self.action_space = [i for i in range(n_actions)]
         self.buffer_size = max_mem_size
         self.batch_size = batch_size
-        self.mem_cntr = 0
 
         self.q_eval = QNetwork(
             lr=lr, input_dims=input_dims, layer1_dims=32, n_actions=n_actions)
 
-        self.state_buffer = np.zeros(
-            (self.buffer_size, *input_dims), dtype=np.float32)
-        self.new_state_buffer = np.zeros(
-            (self.buffer_size, *input_dims), dtype=np.float32)
-        self.action_buffer = np.zeros(self.buffer_size, dtype=np.int32)
-        self.reward_buffer = np.zeros(self.buffer_size, dtype=np.float32)
-        self.terminal_buffer = np.zeros(self.buffer_size, dtype=np.bool)
+        # Network choosing the actions. An asynchronous learner replaces it
+        # with a copy of q_eval, updated periodically.
+        self.q_act = self.q_eval
+
+        self.prioritized = prioritized
+
+        if replay_path is not None:
+            if prioritized:
+                raise ValueError(
+                    "Priorities are not kept on the disk, so prioritized replay cannot use a memory-mapped buffer")
+
+            self.memory = MemmapReplayBuffer(replay_path, max_mem_size, input_dims,
+                                             device=self.q_eval.device)
+        elif prioritized:
+            self.memory = PrioritizedReplayBuffer(max_mem_size, input_dims, device=self.q_eval.device,
+                                                  pin_memory=self.q_eval.device.type == 'cuda')
+        else:
+            self.memory = ReplayBuffer(max_mem_size, input_dims, device=self.q_eval.device,
+                                       pin_memory=self.q_eval.device.type == 'cuda')
 
     def store_transition(self, state, action, reward, new_state, done):
         """!
         Stores the state transition for later memory replay.
 
-        @param state        (list): Vector describing current state
+        @param state        (ndarray): Vector describing current state
         @param action       (int): Action taken
         @param reward       (float): Received reward
-        @param new_state    (list): Newly observed state.
+        @param new_state    (ndarray): Newly observed state.
+        """
+
+        self.memory.store_transition(state, action, reward, new_state, done)
+
+    @property
+    def mem_cntr(self):
+        """!
+        Number of transitions stored so far.
         """
 
-        index = self.mem_cntr % self.buffer_size
+        return self.memory.mem_cntr
 
-        self.state_buffer[index] = state
-        self.new_state_buffer[index] = new_state
-        self.reward_buffer[index] = reward
-        self.action_buffer[index] = action
-        self.terminal_buffer[index] = done
+    def state_dict(self):
+        """!
+        Copies everything that changes during training: the network,
+        the moments of the optimizer, the exploration rate and the replay buffer.
 
-        self.mem_cntr += 1
+        @return dict: state of the agent
+        """
+
+        return {"q_eval": {key: value.clone() for key, value in self.q_eval.state_dict().items()},
+                "optimizer": _clone(self.q_eval.optimizer.state_dict()),
+                "epsilon": self.epsilon,
+                "memory": self.memory.state_dict()}
+
+    def load_state_dict(self, state):
+        """!
+        Restores the state copied by state_dict.
+
+        @param state (dict): State of the agent
+        """
+
+        self.q_eval.load_state_dict(state["q_eval"])
+        self.q_eval.optimizer.load_state_dict(state["optimizer"])
+        self.epsilon = state["epsilon"]
+        self.memory.load_state_dict(state["memory"])
 
     def choose_action(self, observation):
         """!
         Chooses agent's action based on observation and exploration strategy.
 
-        @param observation (list): Vector describing current state
+        @param observation (ndarray): Vector describing current state
 
         @return int: Action to take
         """
@@ -120,9 +158,30 @@ class Agent():
         elif self.exploration == Exploration.SOFTMAX:
             return self.__choose_action_softmax(observation)
 
-    def learn(self):
+    def choose_actions(self, observations):
+        """!
+        Chooses actions of a batch of observations, e.g. one per environment,
+        with a single pass through the network.
+
+        @param observations (ndarray): (N, input_dims) vectors describing current states
+
+        @return ndarray: (N,) actions to take
+        """
+
+        with T.no_grad():
+            actions = self.q_act.feed_forward(self.__to_batch(observations))
+
+        if self.exploration == Exploration.EPSILON_GREEDY:
+            return self.__choose_actions_eps_greedy(actions)
+        elif self.exploration == Exploration.SOFTMAX:
+            return self.__choose_actions_softmax(actions)
+
+    def learn(self, decay_exploration=True):
         """! 
         Updates the network using memory replay.
+
+        @param decay_exploration (bool): Whether the exploration rate is decreased after the update.
+                                         An asynchronous learner decreases it per collected transition instead.
         """
 
         if self.mem_cntr < self.batch_size:
@@ -130,46 +189,60 @@ class Agent():
 
         self.q_eval.optimizer.zero_grad()
 
-        max_mem = min(self.mem_cntr, self.buffer_size)
-        batch = np.random.choice(max_mem, self.batch_size, replace=False)
-
-        batch_index = np.arange(self.batch_size, dtype=np.int32)
+        if self.prioritized:
+            batch, indices, weights = self.memory.sample_prioritized(
+                self.batch_size)
+        else:
+            batch = self.memory.sample(self.batch_size)
 
-        state_batch = T.tensor(self.state_buffer[batch]).to(self.q_eval.device)
-        new_state_batch = T.tensor(
-            self.new_state_buffer[batch]).to(self.q_eval.device)
-        reward_batch = T.tensor(
-            self.reward_buffer[batch]).to(self.q_eval.device)
-        terminal_batch = T.tensor(
-            self.terminal_buffer[batch]).to(self.q_eval.device)
+        state_batch, action_batch, reward_batch, new_state_batch, terminal_batch = batch
 
-        action_batch = self.action_buffer[batch]
-        q_eval = self.q_eval.feed_forward(
-            state_batch)[batch_index, action_batch]
+        q_eval = self.q_eval.feed_forward(state_batch).gather(
+            1, action_batch.unsqueeze(1)).squeeze(1)
         q_next = self.q_eval.feed_forward(new_state_batch)
         q_next[terminal_batch] = 0.0
 
         q_target = reward_batch + self.gamma * T.max(q_next, dim=1)[0]
 
-        loss = self.q_eval.loss(q_target, q_eval).to(self.q_eval.device)
+        errors = self.q_eval.loss(q_target, q_eval)
+
+        if self.prioritized:
+            # Importance-sampling weights correct the bias of the prioritized sampling
+            loss = (errors * weights).mean()
+            self.memory.update_priorities(indices, errors)
+        else:
+            loss = errors.mean()
+
         loss.backward()
         self.q_eval.optimizer.step()
 
-        self.epsilon = self.epsilon - \
-            self.exploration_dec if self.epsilon > self.exploration_min else self.exploration_min
+        if decay_exploration:
+            self.decay_exploration()
+
+    def decay_exploration(self, steps=1):
+        """!
+        Decreases the exploration rate towards exploration_min.
+
+        @param steps (int): Number of decrease steps
+        """
+
+        for _ in range(steps):
+            self.epsilon = self.epsilon - \
+                self.exploration_dec if self.epsilon > self.exploration_min else self.exploration_min
 
     def __choose_action_eps_greedy(self, observation):
         """!
         Chooses agent's action according to epsilon greedy strategy.
 
-        @param observation (list): current environment's state
+        @param observation (ndarray): current environment's state
 
         return int: action to take
         """
 
         if np.random.random() > self.epsilon:
-            state = T.tensor([observation]).to(self.q_eval.device)  # why []?
-            actions = self.q_eval.feed_forward(state)
+            with T.no_grad():
+                actions = self.q_act.feed_forward(
+                    self.__to_tensor(observation))
             action = T.argmax(actions).item()
         else:
             action = np.random.choice(self.action_space)
@@ -180,32 +253,107 @@ class Agent():
         """!
         Chooses agent's action according to softmax exploration strategy.
 
-        @param observation (list): current environment's state
+        @param observation (ndarray): current environment's state
 
         return int: action to take
         """
 
-        state = T.tensor([observation]).to(self.q_eval.device)  # why []?
-        actions = self.q_eval.feed_forward(state)
-        action = T.argmax(actions).item()
+        with T.no_grad():
+            actions = self.q_act.feed_forward(self.__to_tensor(observation))
+
+        return self.__sample_softmax(actions).item()
+
+    def __choose_actions_eps_greedy(self, actions):
+        """!
+        Chooses actions of a batch according to epsilon greedy strategy.
+        Every row explores independently.
+
+        @param actions (Tensor): (N, n_actions) Q-values of the batch
+
+        return ndarray: (N,) actions to take
+        """
+
+        n = len(actions)
+
+        greedy = T.argmax(actions, dim=1).cpu().numpy()
+        explore = np.random.random(n) <= self.epsilon
+
+        return np.where(explore, np.random.randint(len(self.action_space), size=n), greedy)
+
+    def __choose_actions_softmax(self, actions):
+        """!
+        Chooses actions of a batch according to softmax exploration strategy.
+
+        @param actions (Tensor): (N, n_actions) Q-values of the batch
+
+        return ndarray: (N,) actions to take
+        """
+
+        return self.__sample_softmax(actions).cpu().numpy()
+
+    def __sample_softmax(self, actions):
+        """!
+        Samples actions from the softmax of the Q-values with temperature epsilon,
+        using the Gumbel-max trick: argmax(Q / epsilon + G), where G ~ Gumbel(0, 1).
+        Q-values are never exponentiated, so large ones cannot overflow.
+        A temperature of 0 chooses the best actions.
+
+        @param actions (Tensor): (N, n_actions) Q-values, overwritten by the sampling
+
+        return Tensor: (N,) actions to take
+        """
+
+        if self.epsilon <= 0:
+            return T.argmax(actions, dim=1)
+
+        # -log(E), where E ~ Exp(1), is Gumbel distributed.
+        # Scaling the noise instead of the Q-values leaves the argmax unchanged.
+        noise = T.empty_like(actions).exponential_().log_()
+
+        return T.argmax(actions.sub_(noise, alpha=self.epsilon), dim=1)
+
+    def __to_tensor(self, observation):
+        """!
+        Converts an observation to a batch of one, without copying it on the CPU.
+
+        @param observation (ndarray): current environment's state
+
+        return Tensor: (1, input_dims) view of the observation
+        """
+
+        state = np.asarray(observation, dtype=np.float32)
+
+        return T.from_numpy(state).unsqueeze(0).to(self.q_eval.device)
+
+    def __to_batch(self, observations):
+        """!
+        Converts a batch of observations to a tensor, without copying it on the CPU.
+
+        @param observations (ndarray): (N, input_dims) current environments' states
+
+        return Tensor: (N, input_dims) view of the observations
+        """
+
+        states = np.asarray(observations, dtype=np.float32)
+
+        return T.from_numpy(states).to(self.q_eval.device)
 
-        probabilites = []
-        q_values = []
 
-        for a in actions[0]:
-            q_values.append(a.item())
+def _clone(value):
+    """!
+    Copies the tensors nested in dictionaries and lists, e.g. the state of an optimizer.
+    Faster than copy.deepcopy, which also copies every number.
 
-        a = False
-        for q in q_values:
-            try:
-                probabilites.append(
-                    math.exp((q-sum(q_values)/len(q_values)) / self.epsilon))
-            except:
-                probabilites.append(1e5)  # dealing with overflow
+    @param value: Tensor, dictionary, list or immutable value
 
-        s = sum(probabilites)
+    @return: copy of the value
+    """
 
-        for i, p in enumerate(probabilites):
-            probabilites[i] /= s
+    if isinstance(value, T.Tensor):
+        return value.clone()
+    elif isinstance(value, dict):
+        return {key: _clone(item) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [_clone(item) for item in value]
 
-        return random.choices(self.action_space, weights=probabilites)[0]
+    return value
@@ -0,0 +1,559 @@
+import json
+import mmap
+import os
+import threading
+import warnings
+import torch as T
+import numpy as np
+
+
+class ReplayBuffer():
+    """!
+    Memory replay buffer keeping the transitions in a single preallocated tensor.
+    Every row holds the state, the new state, the action, the reward and
+    whether the episode finished, so a whole batch is gathered
+    with one indexed read.
+    Storing and sampling hold a lock, so a learner thread can sample
+    while transitions are stored.
+    """
+
+    def __init__(self, max_size, input_dims, device=T.device('cpu'), pin_memory=False, rows=None):
+        """!
+        Allocates the buffer.
+
+        @param max_size     (int): Number of transitions kept in the buffer
+        @param input_dims   (list): Dimensions of the state space
+        @param device       (device): Device the sampled batches are moved to
+        @param pin_memory   (bool): Whether the storage is page-locked, which speeds up copies to a GPU
+        @param rows         (ndarray): (max_size, row_size) float32 array holding the transitions,
+                                       e.g. a memory-mapped file. Allocated when not given.
+        """
+
+        self.max_size = max_size
+        self.input_dims = input_dims
+        self.device = device
+        self.mem_cntr = 0
+
+        self.state_size = int(np.prod(input_dims))
+
+        # State, new state, action, reward, terminal
+        self.row_size = 2 * self.state_size + 3
+
+        self.pin_memory = pin_memory
+
+        if rows is None:
+            self.storage = T.zeros((max_size, self.row_size),
+                                   dtype=T.float32, pin_memory=pin_memory)
+            rows = self.storage.numpy()
+        else:
+            self.storage = T.from_numpy(rows)
+
+        # Transitions are written through a NumPy view sharing the memory of the storage.
+        # It keeps the flags of the given array, so read-only rows cannot be overwritten.
+        self.__rows = rows
+
+        # Reentrant, so that subclasses can hold it around the methods of the buffer
+        self.lock = threading.RLock()
+
+    def store_transition(self, state, action, reward, new_state, done):
+        """!
+        Stores the state transition, overwriting the oldest one when the buffer is full.
+
+        @param state        (ndarray): Vector describing current state
+        @param action       (int): Action taken
+        @param reward       (float): Received reward
+        @param new_state    (ndarray): Newly observed state
+        @param done         (bool): Whether the episode finished
+        """
+
+        with self.lock:
+            row = self.__rows[self.mem_cntr % self.max_size]
+            n = self.state_size
+
+            row[:n] = state
+            row[n:2*n] = new_state
+            row[2*n] = action
+            row[2*n + 1] = reward
+            row[2*n + 2] = done
+
+            self.mem_cntr += 1
+
+    def store_transitions(self, rows):
+        """!
+        Stores a batch of transitions already laid out as rows of the buffer,
+        e.g. received from other processes.
+
+        @param rows (ndarray): (N, row_size) transitions
+        """
+
+        with self.lock:
+            indices = (self.mem_cntr + np.arange(len(rows))) % self.max_size
+            self.__rows[indices] = rows
+
+            self.mem_cntr += len(rows)
+
+    def sample(self, batch_size):
+        """!
+        Samples a batch of transitions uniformly, with replacement.
+
+        @param batch_size (int): Number of transitions
+
+        @return Tensor: (batch_size, *input_dims) states
+        @return Tensor: (batch_size,) actions
+        @return Tensor: (batch_size,) rewards
+        @return Tensor: (batch_size, *input_dims) new states
+        @return Tensor: (batch_size,) whether the episodes finished
+        """
+
+        batch = T.randint(len(self), (batch_size,))
+
+        return self.get(batch)
+
+    def get(self, batch):
+        """!
+        Gathers the selected transitions.
+
+        @param batch (Tensor): Indices of the transitions
+
+        @return Tensor: (batch_size, *input_dims) states
+        @return Tensor: (batch_size,) actions
+        @return Tensor: (batch_size,) rewards
+        @return Tensor: (batch_size, *input_dims) new states
+        @return Tensor: (batch_size,) whether the episodes finished
+        """
+
+        if self.pin_memory:
+            # Page-locked blocks are cached by torch and reused once their copies finish
+            rows = T.empty((len(batch), self.row_size),
+                           dtype=T.float32, pin_memory=True)
+            with self.lock:
+                T.index_select(self.storage, 0, batch, out=rows)
+        else:
+            with self.lock:
+                rows = self.storage.index_select(0, batch)
+
+        rows = rows.to(self.device, non_blocking=True)
+        n = self.state_size
+
+        states = rows[:, :n].view(-1, *self.input_dims)
+        new_states = rows[:, n:2*n].view(-1, *self.input_dims)
+        actions = rows[:, 2*n].long()
+        rewards = rows[:, 2*n + 1]
+        terminals = rows[:, 2*n + 2].bool()
+
+        return states, actions, rewards, new_states, terminals
+
+    def state_dict(self):
+        """!
+        Copies the stored transitions.
+
+        @return dict: state of the buffer
+        """
+
+        with self.lock:
+            return {"mem_cntr": self.mem_cntr, "rows": self.storage[:len(self)].clone()}
+
+    def load_state_dict(self, state):
+        """!
+        Restores the transitions copied by state_dict.
+
+        @param state (dict): State of the buffer
+        """
+
+        with self.lock:
+            rows = state["rows"]
+            self.storage[:len(rows)] = rows
+            self.mem_cntr = state["mem_cntr"]
+
+    def __len__(self):
+        return min(self.mem_cntr, self.max_size)
+
+
+class MemmapReplayBuffer(ReplayBuffer):
+    """!
+    Memory replay buffer kept in memory-mapped files in a directory,
+    so it can be larger than the RAM, survives the process and can be
+    read by other processes while it is filled.
+    The directory holds
+        header.json     - size, layout and type of the transitions
+        transitions.dat - (max_size, row_size) rows of the buffer
+        cursor.dat      - number of transitions stored so far, as an int64.
+                          The write position is mem_cntr % max_size and the count min(mem_cntr, max_size).
+    """
+
+    def __init__(self, path, max_size=None, input_dims=None, readonly=False, device=T.device('cpu')):
+        """!
+        Opens the buffer, creating it if the directory holds none.
+
+        @param path         (string): Directory of the buffer
+        @param max_size     (int): Number of transitions kept in the buffer. Only used when it is created.
+        @param input_dims   (list): Dimensions of the state space. Checked against an existing buffer.
+        @param readonly     (bool): Whether the buffer is only read, e.g. for analysis while another process trains
+        @param device       (device): Device the sampled batches are moved to
+        """
+
+        self.path = path
+        self.readonly = readonly
+
+        header_path = os.path.join(path, "header.json")
+
+        if os.path.exists(header_path):
+            with open(header_path) as file:
+                header = json.load(file)
+
+            if input_dims is not None and list(input_dims) != header["input_dims"]:
+                raise ValueError(
+                    f"The buffer in {path} holds states of dimensions {header['input_dims']}, not {list(input_dims)}")
+
+            mode = "r" if readonly else "r+"
+        else:
+            if readonly:
+                raise FileNotFoundError(f"No replay buffer in {path}")
+
+            state_size = int(np.prod(input_dims))
+            header = {"max_size": max_size, "input_dims": list(input_dims),
+                      "row_size": 2 * state_size + 3, "dtype": "float32",
+                      "layout": ["state", "new_state", "action", "reward", "terminal"]}
+
+            os.makedirs(path, exist_ok=True)
+            mode = "w+"
+
+        shape = (header["max_size"], header["row_size"])
+
+        self.__transitions, rows = _map_file(os.path.join(path, "transitions.dat"),
+                                             shape, header["dtype"], mode)
+        self.__cursor_file, cursor = _map_file(os.path.join(path, "cursor.dat"),
+                                               (1,), np.int64, mode)
+
+        # Sampled rows are scattered, so reading ahead of them only evicts useful pages
+        if hasattr(self.__transitions, "madvise"):
+            self.__transitions.madvise(mmap.MADV_RANDOM)
+
+        # The base class resets the counter, which must not reach the file
+        self.__cursor = np.zeros(1, dtype=np.int64)
+
+        with warnings.catch_warnings():
+            # Torch warns about wrapping read-only arrays
+            warnings.simplefilter("ignore", UserWarning)
+            super(MemmapReplayBuffer, self).__init__(
+                header["max_size"], header["input_dims"], device=device, rows=rows)
+
+        self.__cursor = cursor
+
+        # Written last, so that a directory with a header always holds a complete buffer
+        if mode == "w+":
+            with open(header_path, "w") as file:
+                json.dump(header, file, indent=4)
+
+    @property
+    def mem_cntr(self):
+        """!
+        Number of transitions stored so far, kept in the cursor file.
+        """
+
+        return int(self.__cursor[0])
+
+    @mem_cntr.setter
+    def mem_cntr(self, value):
+        self.__cursor[0] = value
+
+    def state_dict(self):
+        """!
+        Records the position of the buffer. The transitions stay in the files,
+        so they are not copied.
+
+        @return dict: state of the buffer
+        """
+
+        self.flush()
+
+        with self.lock:
+            return {"mem_cntr": self.mem_cntr, "path": self.path}
+
+    def load_state_dict(self, state):
+        """!
+        Moves the buffer back to a recorded position.
+        Transitions stored after it was recorded stay in the files until they are overwritten.
+
+        @param state (dict): State of the buffer
+        """
+
+        with self.lock:
+            self.mem_cntr = state["mem_cntr"]
+
+    def flush(self):
+        """!
+        Writes the changes to the disk. The operating system also does so on its own,
+        even if the process is killed.
+        """
+
+        if not self.readonly:
+            self.__transitions.flush()
+            self.__cursor_file.flush()
+
+
+def _map_file(path, shape, dtype, mode):
+    """!
+    Maps a file to an array.
+
+    @param path (string): Path of the file
+    @param shape (tuple): Shape of the array
+    @param dtype (type): Type of the array
+    @param mode (string): "w+" creates the file, "r+" opens it for writing, "r" for reading only
+
+    @return mmap: the map, used to flush the changes
+    @return ndarray: array backed by the map, read-only in the "r" mode
+    """
+
+    size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+    with open(path, {"w+": "w+b", "r+": "r+b", "r": "rb"}[mode]) as file:
+        if mode == "w+":
+            # The file is sparse, so the disk is only used once the rows are written
+            file.truncate(size)
+        elif os.fstat(file.fileno()).st_size < size:
+            raise ValueError(f"{path} is smaller than {size} bytes")
+
+        mapped = mmap.mmap(file.fileno(), size,
+                           access=mmap.ACCESS_READ if mode == "r" else mmap.ACCESS_WRITE)
+
+    return mapped, np.ndarray(shape, dtype=dtype, buffer=mapped)
+
+
+class SumTree():
+    """!
+    Binary tree stored in a flat array. Leaves hold the priorities of the transitions
+    and every other node holds the sum of its children, so sampling proportionally
+    to the priorities and updating them both take O(log N).
+    Node i has children 2i and 2i + 1, the root is node 1.
+    """
+
+    def __init__(self, capacity):
+        """!
+        Allocates the tree.
+
+        @param capacity (int): Number of leaves
+        """
+
+        self.capacity = capacity
+
+        # Rounding the number of leaves up to a power of two keeps all of them at the same depth
+        self.leaves = 1 << max(capacity - 1, 1).bit_length()
+        self.depth = self.leaves.bit_length() - 1
+
+        self.tree = np.zeros(2 * self.leaves)
+
+    @property
+    def total(self):
+        """!
+        Sum of all the priorities.
+        """
+
+        return self.tree[1]
+
+    def get(self, indices):
+        """!
+        Reads priorities.
+
+        @param indices (ndarray): Indices of the leaves
+
+        @return ndarray: priorities
+        """
+
+        return self.tree[self.leaves + indices]
+
+    def set(self, index, priority):
+        """!
+        Sets a single priority.
+
+        @param index (int): Index of the leaf
+        @param priority (float): New priority
+        """
+
+        tree = self.tree
+        node = self.leaves + index
+        change = priority - tree[node]
+
+        while node >= 1:
+            tree[node] += change
+            node //= 2
+
+    def update(self, indices, priorities):
+        """!
+        Sets a batch of priorities, updating every level of the tree at once.
+
+        @param indices (ndarray): Indices of the leaves
+        @param priorities (ndarray): New priorities
+        """
+
+        nodes = self.leaves + np.asarray(indices)
+        self.tree[nodes] = priorities
+
+        # Repeated nodes are given the same sum, so they need not be removed
+        for _ in range(self.depth):
+            nodes //= 2
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values):
+        """!
+        Finds the leaves at which the cumulative sums of the priorities reach given values.
+        The whole batch descends the tree together.
+
+        @param values (ndarray): Values between 0 and the total
+
+        @return ndarray: indices of the leaves
+        """
+
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+
+        for _ in range(self.depth):
+            left = self.tree[2 * nodes]
+            right = values > left
+
+            values -= left * right
+            nodes = 2 * nodes + right
+
+        return nodes - self.leaves
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """!
+    Memory replay buffer sampling transitions proportionally
+    to their last absolute TD errors raised to the power of alpha.
+    The bias of the non-uniform sampling is corrected by importance-sampling weights.
+    """
+
+    def __init__(self, max_size, input_dims, alpha=0.6, beta=0.4, beta_increment=1e-5, min_priority=1e-3, device=T.device('cpu'), pin_memory=False):
+        """!
+        Allocates the buffer.
+
+        @param max_size         (int): Number of transitions kept in the buffer
+        @param input_dims       (list): Dimensions of the state space
+        @param alpha            (float): How strongly the priorities affect sampling. 0 samples uniformly.
+        @param beta             (float): Initial strength of the importance-sampling correction
+        @param beta_increment   (float): Increase of beta after every sampled batch, up to 1
+        @param min_priority     (float): Added to the absolute TD errors, so that every transition can be sampled
+        @param device           (device): Device the sampled batches are moved to
+        @param pin_memory       (bool): Whether the storage is page-locked, which speeds up copies to a GPU
+        """
+
+        super(PrioritizedReplayBuffer, self).__init__(
+            max_size, input_dims, device=device, pin_memory=pin_memory)
+
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.min_priority = min_priority
+
+        self.max_priority = 1.0
+        self.tree = SumTree(max_size)
+
+    def store_transition(self, state, action, reward, new_state, done):
+        """!
+        Stores the state transition with the highest priority seen so far,
+        so that it is sampled at least once soon.
+
+        @param state        (ndarray): Vector describing current state
+        @param action       (int): Action taken
+        @param reward       (float): Received reward
+        @param new_state    (ndarray): Newly observed state
+        @param done         (bool): Whether the episode finished
+        """
+
+        with self.lock:
+            self.tree.set(self.mem_cntr % self.max_size, self.max_priority)
+
+            super(PrioritizedReplayBuffer, self).store_transition(
+                state, action, reward, new_state, done)
+
+    def store_transitions(self, rows):
+        """!
+        Stores a batch of transitions already laid out as rows of the buffer,
+        all with the highest priority seen so far.
+
+        @param rows (ndarray): (N, row_size) transitions
+        """
+
+        with self.lock:
+            indices = (self.mem_cntr + np.arange(len(rows))) % self.max_size
+            self.tree.update(indices, np.full(len(rows), self.max_priority))
+
+            super(PrioritizedReplayBuffer, self).store_transitions(rows)
+
+    def sample_prioritized(self, batch_size):
+        """!
+        Samples a batch of transitions proportionally to their priorities.
+        The total priority is split into equal segments and one transition is drawn from each.
+
+        @param batch_size (int): Number of transitions
+
+        @return tuple: states, actions, rewards, new states and terminals, as returned by sample
+        @return ndarray: (batch_size,) indices of the transitions, used to update their priorities
+        @return Tensor: (batch_size,) importance-sampling weights, normalized to at most 1
+        """
+
+        with self.lock:
+            total = self.tree.total
+            values = (np.arange(batch_size) + np.random.random(batch_size)) * \
+                (total / batch_size)
+
+            # Rounding errors could lead past the last stored transition
+            indices = np.minimum(self.tree.find(values), len(self) - 1)
+            probabilities = self.tree.get(indices) / total
+
+            weights = (len(self) * probabilities) ** -self.beta
+            weights /= weights.max()
+
+            self.beta = min(self.beta + self.beta_increment, 1.0)
+
+            batch = self.get(T.from_numpy(indices))
+        weights = T.from_numpy(weights.astype(np.float32)).to(self.device)
+
+        return batch, indices, weights
+
+    def state_dict(self):
+        """!
+        Copies the stored transitions and their priorities.
+
+        @return dict: state of the buffer
+        """
+
+        with self.lock:
+            state = super(PrioritizedReplayBuffer, self).state_dict()
+            state["priorities"] = self.tree.get(np.arange(len(self)))
+            state["max_priority"] = self.max_priority
+            state["beta"] = self.beta
+
+        return state
+
+    def load_state_dict(self, state):
+        """!
+        Restores the transitions and priorities copied by state_dict.
+
+        @param state (dict): State of the buffer
+        """
+
+        with self.lock:
+            super(PrioritizedReplayBuffer, self).load_state_dict(state)
+
+            priorities = state["priorities"]
+            self.tree.tree[:] = 0
+            self.tree.update(np.arange(len(priorities)), priorities)
+            self.max_priority = state["max_priority"]
+            self.beta = state["beta"]
+
+    def update_priorities(self, indices, errors):
+        """!
+        Updates the priorities of sampled transitions.
+
+        @param indices (ndarray): Indices returned by sample_prioritized
+        @param errors (Tensor): Absolute TD errors of the transitions
+        """
+
+        priorities = (errors.detach().cpu().numpy().astype(np.float64) +
+                      self.min_priority) ** self.alpha
+
+        with self.lock:
+            self.max_priority = max(self.max_priority, priorities.max())
+            self.tree.update(indices, priorities)
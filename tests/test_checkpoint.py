@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import torch as T
+
+from checkpoint import Checkpointer
+from environment.environment import Environment
+from network import Agent
+
+
+def make(prioritized):
+    agent = Agent(gamma=0.99, epsilon=1.0, lr=0.001, input_dims=[5], batch_size=16,
+                  max_mem_size=500, exploration_dec=1e-3, prioritized=prioritized)
+
+    env = Environment()
+    env.curriculum.enable_random_starting_rotation()
+    env.curriculum.set_random_height(1, 3)
+    env.curriculum.enable_increasing_height()
+
+    return agent, env
+
+
+def train(agent, env, steps):
+    """!
+    Collects and learns like train.py.
+
+    @return list: observations and rewards seen
+    """
+
+    seen = []
+    observation = env.reset()
+
+    for _ in range(steps):
+        action = agent.choose_action(observation)
+        new_observation, reward, done, _ = env.step(action)
+        agent.store_transition(observation, action, reward, new_observation, done)
+        agent.learn()
+
+        seen.append((new_observation.copy(), reward))
+        observation = env.reset() if done else new_observation
+
+    return seen
+
+
+@pytest.mark.parametrize("prioritized", [False, True])
+def test_resumed_training_is_identical(tmp_path, prioritized):
+    T.manual_seed(0)
+    np.random.seed(0)
+
+    agent, env = make(prioritized)
+    env.reset(seed=0)
+    train(agent, env, 150)
+
+    with Checkpointer(str(tmp_path), keep=1) as checkpointer:
+        checkpointer.save(150, agent, env, extra={"scores": [1.0, 2.0]})
+        checkpointer.wait()
+
+        expected_batch = agent.memory.sample(16)
+        expected = train(agent, env, 100)
+
+        # Different generators and weights, which the checkpoint replaces
+        T.manual_seed(1)
+        np.random.seed(1)
+        resumed_agent, resumed_env = make(prioritized)
+        resumed_env.reset(seed=1)
+
+        episode, extra = checkpointer.restore(resumed_agent, resumed_env)
+
+    assert episode == 150
+    assert extra == {"scores": [1.0, 2.0]}
+
+    for actual, stored in zip(resumed_agent.memory.sample(16), expected_batch):
+        assert T.equal(actual, stored)
+
+    actual = train(resumed_agent, resumed_env, 100)
+
+    for (observation, reward), (expected_observation, expected_reward) in zip(actual, expected):
+        np.testing.assert_array_equal(observation, expected_observation)
+        assert reward == expected_reward
+
+    assert resumed_agent.epsilon == agent.epsilon
+    for name, value in agent.q_eval.state_dict().items():
+        assert T.equal(resumed_agent.q_eval.state_dict()[name], value)
+
+
+def test_only_the_newest_checkpoints_are_kept(tmp_path):
+    agent, env = make(False)
+
+    with Checkpointer(str(tmp_path), keep=2) as checkpointer:
+        for episode in [1, 2, 10]:
+            checkpointer.save(episode, agent)
+
+        checkpointer.wait()
+
+        assert checkpointer.latest().endswith("checkpoint_10.pt")
+        assert len(list(tmp_path.glob("checkpoint_*.pt"))) == 2
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from environment.constants import *
+from environment.environment import SNAPSHOT_FIELDS, Curriculum, Environment, Snapshot
+
+
+def place(env, **fields):
+    state = env.get_state_snapshot().state.copy()
+
+    for name, value in fields.items():
+        state[SNAPSHOT_FIELDS.index(name)] = value
+
+    return env.restore_state_snapshot(Snapshot(state, None))
+
+
+def landing_reward(observation):
+    position_y, velocity_y, velocity_x, angular_velocity, angle = observation
+
+    return REWARD_LANDING - abs(velocity_y + 1) - \
+        PENALTY_PER_RADIAN_AT_LANDING * abs(angle) - \
+        PENALTY_PER_ANGULAR_VELOCITY_AT_LANDING * abs(angular_velocity)
+
+
+def test_coasting_penalizes_every_timestep():
+    env = Environment(analytic_coasting=True)
+    place(env, position_y=10, velocity_y=0)
+
+    observation, reward, done, _ = env.step(Action.NOTHING, repeat=3)
+
+    assert not done
+    assert reward == pytest.approx(-3 * PENALTY_PER_SECOND * TIMESTEP)
+    assert env.timestep == pytest.approx(3 * TIMESTEP)
+
+
+def test_coasting_landing_replaces_the_penalty_of_its_timestep():
+    env = Environment(analytic_coasting=True)
+
+    # Touches the ground in the middle of the third timestep
+    place(env, position_y=GRAVITY * (2.5 * TIMESTEP) ** 2 / 2, velocity_y=0)
+
+    observation, reward, done, _ = env.step(Action.NOTHING, repeat=5)
+
+    assert done
+    assert observation[0] == 0
+    assert env.timestep == pytest.approx(2.5 * TIMESTEP)
+    assert reward == pytest.approx(-2 * PENALTY_PER_SECOND * TIMESTEP + landing_reward(observation))
+
+
+def test_coasting_rewards_a_landing_like_the_simulation():
+    coasting = Environment(analytic_coasting=True)
+    simulated = Environment()
+
+    for env in [coasting, simulated]:
+        place(env, position_y=0.001, velocity_y=-1)
+
+    for env in [coasting, simulated]:
+        observation, reward, done, _ = env.step(Action.NOTHING)
+
+        assert done
+        assert reward == pytest.approx(landing_reward(observation))
+
+
+def test_coasting_prefers_landing_on_ties():
+    env = Environment(analytic_coasting=True)
+
+    # Leaves the bounds at the very moment it touches the ground
+    place(env, position_x=10, position_y=0, velocity_x=1, velocity_y=0)
+
+    observation, reward, done, _ = env.step(Action.NOTHING)
+
+    assert done
+    assert env.timestep == 0
+    assert reward == pytest.approx(landing_reward(observation))
+
+
+def random_curriculum(curriculum):
+    curriculum.enable_random_starting_rotation()
+    curriculum.enable_landing_target()
+    curriculum.set_random_height(1, 2)
+    curriculum.enable_increasing_height()
+
+    return curriculum
+
+
+def test_empty_batch_of_heights():
+    curriculum = random_curriculum(Curriculum())
+    maximum = curriculum.max
+
+    heights = curriculum.sample_heights(0, np.random.default_rng(0))
+
+    assert heights.shape == (0,)
+    assert curriculum.max == maximum
+
+
+def test_batch_of_heights_matches_single_samples():
+    batch, single = random_curriculum(Curriculum()), random_curriculum(Curriculum())
+    batch_rng, single_rng = np.random.default_rng(0), np.random.default_rng(0)
+
+    heights = batch.sample_heights(50, batch_rng)
+
+    np.testing.assert_array_equal(heights, [single.get_height(single_rng) for _ in range(50)])
+    assert batch.max == pytest.approx(2 + 50 * 0.01)
+    assert batch.max == single.max
+
+
+def test_seeded_resets_are_reproducible():
+    envs = [Environment(), Environment()]
+    for env in envs:
+        random_curriculum(env.curriculum)
+
+    first = [np.stack([env.reset(seed=7)] + [env.reset() for _ in range(5)]) for env in envs]
+
+    np.testing.assert_array_equal(first[0], first[1])
+    assert len(np.unique(first[0][:, 0])) == 6
+
+
+def test_snapshot_restores_the_generator():
+    env = Environment()
+    random_curriculum(env.curriculum)
+    env.reset(seed=7)
+
+    snapshot = env.get_state_snapshot(include_rng=True)
+    expected = env.reset()
+
+    env.restore_state_snapshot(snapshot)
+
+    np.testing.assert_array_equal(env.reset(), expected)
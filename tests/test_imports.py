@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+import pytest
+
+ROOT = __file__.rsplit("/tests/", 1)[0]
+
+
+@pytest.mark.parametrize("module", ["environment.environment", "environment.vector_environment",
+                                    "environment.pool", "train"])
+def test_core_does_not_load_heavy_modules(module):
+    # A fresh interpreter, since other tests may have loaded them already
+    script = (f"import sys\nimport {module}\n"
+              "print(','.join(m for m in ('cv2', 'matplotlib', 'pandas') if m in sys.modules))")
+
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == ""
+
+
+def test_spaces_are_created_on_first_use():
+    from environment.environment import Environment
+
+    env = Environment()
+
+    assert env.action_space.n == 4
+    assert env.observation_space.contains(env.reset())
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+import torch as T
+
+from inference import NumpyQNetwork, export
+from network import QNetwork
+
+TOLERANCE = 1e-5
+
+
+@pytest.fixture
+def network():
+    T.manual_seed(0)
+
+    return QNetwork(lr=0.001, input_dims=[5], layer1_dims=32, n_actions=4).cpu()
+
+
+@pytest.fixture
+def states():
+    # Scaled like the observations of the environment
+    rng = np.random.default_rng(0)
+
+    return (rng.standard_normal((2000, 5)) * [5, 10, 3, 1, 0.5]).astype(np.float32)
+
+
+def expected_q_values(network, states):
+    with T.no_grad():
+        return network.feed_forward(T.from_numpy(states)).numpy()
+
+
+def test_batch_matches_qnetwork(network, states):
+    numpy_network = NumpyQNetwork(export(network.state_dict()))
+
+    q_values = numpy_network.feed_forward(states)
+
+    assert q_values.shape == (len(states), 4)
+    np.testing.assert_allclose(q_values, expected_q_values(network, states),
+                               rtol=TOLERANCE, atol=TOLERANCE)
+
+
+def test_single_matches_qnetwork(network, states):
+    numpy_network = NumpyQNetwork(export(network.state_dict()))
+
+    q_values = np.stack([numpy_network.feed_forward(state) for state in states])
+
+    np.testing.assert_allclose(q_values, expected_q_values(network, states),
+                               rtol=TOLERANCE, atol=TOLERANCE)
+
+
+def test_single_results_are_not_overwritten(network, states):
+    numpy_network = NumpyQNetwork(export(network.state_dict()))
+
+    first = numpy_network.feed_forward(states[0])
+    numpy_network.feed_forward(states[1])
+
+    np.testing.assert_allclose(first, numpy_network.feed_forward(states[0]))
+
+
+def test_greedy_actions_match_qnetwork(network, states):
+    numpy_network = NumpyQNetwork(export(network.state_dict()))
+    expected = expected_q_values(network, states)
+
+    # Near ties may be broken either way within the tolerance
+    best = np.sort(expected, axis=1)
+    clear = best[:, -1] - best[:, -2] > 10 * TOLERANCE
+    assert clear.mean() > 0.9
+
+    actions = expected.argmax(axis=1)
+
+    np.testing.assert_array_equal(
+        numpy_network.choose_actions(states)[clear], actions[clear])
+    np.testing.assert_array_equal(
+        np.array([numpy_network.choose_action(state) for state in states])[clear], actions[clear])
+
+
+def test_exported_file(network, states, tmp_path):
+    path = str(tmp_path / "model.npz")
+    export(network.state_dict(), path)
+
+    numpy_network = NumpyQNetwork(path)
+
+    assert numpy_network.input_dims == 5
+    assert numpy_network.n_actions == 4
+    np.testing.assert_allclose(numpy_network.feed_forward(states), expected_q_values(network, states),
+                               rtol=TOLERANCE, atol=TOLERANCE)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from learner import AsyncLearner
+from network import Agent
+
+STEPS = 200
+
+
+def make():
+    return Agent(gamma=0.99, epsilon=1.0, lr=0.001, input_dims=[5], batch_size=16,
+                 max_mem_size=1000, exploration_dec=1e-3)
+
+
+def collect(agent, learn):
+    rng = np.random.default_rng(0)
+
+    for _ in range(STEPS):
+        state = rng.standard_normal(5).astype(np.float32)
+        agent.store_transition(state, int(rng.integers(4)), float(rng.random()), state, False)
+        learn()
+
+
+@pytest.mark.parametrize("updates_per_step", [0.25, 1.0, 4.0])
+def test_exploration_decays_per_collected_transition(updates_per_step):
+    expected = make()
+    collect(expected, expected.learn)
+
+    agent = make()
+    with AsyncLearner(agent, updates_per_step=updates_per_step, max_lag=10) as learner:
+        collect(agent, learner.step)
+
+    assert agent.epsilon == expected.epsilon
+    # Closing skips the updates the learner is behind by, at most max_lag
+    assert STEPS * updates_per_step - 10 <= learner.updates <= STEPS * updates_per_step
+
+
+def test_errors_of_the_learner_are_raised():
+    agent = make()
+
+    def fail(**kwargs):
+        raise ValueError("boom")
+
+    agent.learn = fail
+
+    learner = AsyncLearner(agent, max_lag=10)
+
+    with pytest.raises(RuntimeError) as error:
+        collect(agent, learner.step)
+
+    assert isinstance(error.value.__cause__, ValueError)
+
+    with pytest.raises(RuntimeError):
+        learner.close()
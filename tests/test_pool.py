@@ -0,0 +1,49 @@
+import numpy as np
+
+from environment.environment import Environment
+from environment.pool import EnvironmentPool
+
+N = 6
+
+
+def test_pool_matches_environments():
+    envs = [Environment() for _ in range(N)]
+    expected = np.stack([env.reset(seed=seed)
+                         for env, seed in zip(envs, np.random.SeedSequence(0).spawn(N))])
+
+    rng = np.random.default_rng(0)
+
+    with EnvironmentPool(N, num_workers=2) as pool:
+        np.testing.assert_array_equal(pool.reset(seed=0), expected)
+
+        for _ in range(300):
+            actions = rng.integers(4, size=N)
+            observations, rewards, dones, info = pool.step(actions)
+
+            for i, env in enumerate(envs):
+                observation, reward, done, _ = env.step(int(actions[i]))
+
+                assert reward == rewards[i]
+                assert done == dones[i]
+
+                if done:
+                    np.testing.assert_array_equal(info["final_observation"][i], observation)
+                    observation = env.reset()
+
+                np.testing.assert_array_equal(observations[i], observation)
+
+
+def test_pool_does_not_depend_on_the_number_of_workers():
+    trajectories = []
+
+    for num_workers in [1, 3]:
+        rng = np.random.default_rng(0)
+
+        with EnvironmentPool(N, num_workers=num_workers) as pool:
+            observations = [pool.reset(seed=0)]
+            for _ in range(100):
+                observations.append(pool.step(rng.integers(4, size=N))[0])
+
+        trajectories.append(np.stack(observations))
+
+    np.testing.assert_array_equal(trajectories[0], trajectories[1])
@@ -0,0 +1,31 @@
+import pytest
+
+from environment.constants import *
+from environment.environment import Environment
+from environment.recorder import Recorder
+
+cv2 = pytest.importorskip("cv2")
+
+
+def recorded_fps(directory, env, fps=None):
+    with Recorder(directory=str(directory), every=1, fps=fps) as recorder:
+        recorder.start_episode(0, env)
+        for _ in range(5):
+            env.step(Action.MIDDLE)
+            recorder.record(env)
+        recorder.end_episode()
+
+    video = cv2.VideoCapture(str(directory / "flight_0.mp4"))
+    fps = video.get(cv2.CAP_PROP_FPS)
+    video.release()
+
+    return fps
+
+
+@pytest.mark.parametrize("dt", [TIMESTEP, 0.05])
+def test_videos_play_in_real_time(tmp_path, dt):
+    assert recorded_fps(tmp_path, Environment(dt=dt)) == pytest.approx(1 / dt)
+
+
+def test_given_frame_rate(tmp_path):
+    assert recorded_fps(tmp_path, Environment(dt=0.05), fps=10) == pytest.approx(10)
@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+import torch as T
+
+from replay import MemmapReplayBuffer, PrioritizedReplayBuffer, SumTree
+
+
+def fill(buffer, n):
+    for i in range(n):
+        state = np.full(5, i, dtype=np.float32)
+        buffer.store_transition(state, i % 4, float(i), state + 1, i % 10 == 9)
+
+
+@pytest.mark.parametrize("capacity", [1, 5, 8, 100])
+def test_sum_tree_totals(capacity):
+    rng = np.random.default_rng(0)
+    tree = SumTree(capacity)
+    priorities = np.zeros(capacity)
+
+    for index in rng.integers(capacity, size=50):
+        priorities[index] = rng.random()
+        tree.set(index, priorities[index])
+
+    assert tree.total == pytest.approx(priorities.sum())
+
+    indices = rng.integers(capacity, size=20)
+    priorities[indices] = rng.random(20)
+    # Repeated indices keep the last priority, like the assignment above
+    tree.update(indices, priorities[indices])
+
+    assert tree.total == pytest.approx(priorities.sum())
+    np.testing.assert_array_equal(tree.get(np.arange(capacity)), priorities)
+
+    # Every inner node is the sum of its children
+    nodes = np.arange(1, tree.leaves)
+    np.testing.assert_allclose(tree.tree[nodes], tree.tree[2 * nodes] + tree.tree[2 * nodes + 1])
+
+
+def test_sum_tree_prefix_sum_lookup():
+    tree = SumTree(6)
+    priorities = np.array([1.0, 0.0, 2.0, 3.0, 0.0, 4.0])
+    tree.update(np.arange(6), priorities)
+
+    # Integer priorities keep the sums exact, so the bounds are tested too
+    values = np.array([0.5, 1.0, 1.5, 3.0, 3.01, 6.0, 7.5, 10.0])
+
+    np.testing.assert_array_equal(tree.find(values), [0, 0, 2, 2, 3, 3, 5, 5])
+    np.testing.assert_array_equal(tree.find(values), np.searchsorted(np.cumsum(priorities), values))
+
+
+def test_sampling_follows_the_priorities():
+    np.random.seed(0)
+    buffer = PrioritizedReplayBuffer(8, [5], alpha=1.0, min_priority=0.0)
+    fill(buffer, 8)
+
+    priorities = np.arange(1, 9, dtype=np.float64)
+    buffer.update_priorities(np.arange(8), T.tensor(priorities))
+
+    counts = np.zeros(8)
+    for _ in range(2000):
+        _, indices, _ = buffer.sample_prioritized(16)
+        counts += np.bincount(indices, minlength=8)
+
+    np.testing.assert_allclose(counts / counts.sum(), priorities / priorities.sum(), atol=0.01)
+
+
+def test_importance_sampling_weights():
+    np.random.seed(0)
+    buffer = PrioritizedReplayBuffer(100, [5], alpha=0.5, beta=0.4, beta_increment=0.1)
+    fill(buffer, 60)
+
+    errors = T.rand(60, dtype=T.float64)
+    buffer.update_priorities(np.arange(60), errors)
+
+    batch, indices, weights = buffer.sample_prioritized(32)
+
+    # Transitions are stored in order, so the states tell which ones were sampled
+    np.testing.assert_array_equal(batch[0][:, 0].cpu().numpy(), indices)
+
+    probabilities = (errors.numpy()[indices] + buffer.min_priority) ** 0.5 / buffer.tree.total
+    expected = (60 * probabilities) ** -0.4
+
+    np.testing.assert_allclose(weights.cpu().numpy(), expected / expected.max(), rtol=1e-5)
+    assert buffer.beta == pytest.approx(0.5)
+
+
+def test_memmap_buffer_round_trips_after_reopen(tmp_path):
+    path = str(tmp_path / "buffer")
+
+    buffer = MemmapReplayBuffer(path, max_size=20, input_dims=[5])
+    # Wraps around, so the oldest transitions are overwritten
+    fill(buffer, 30)
+    expected = buffer.get(T.arange(20))
+    buffer.flush()
+    del buffer
+
+    for readonly in [False, True]:
+        reopened = MemmapReplayBuffer(path, input_dims=[5], readonly=readonly)
+
+        assert reopened.mem_cntr == 30
+        assert len(reopened) == 20
+
+        for actual, stored in zip(reopened.get(T.arange(20)), expected):
+            assert T.equal(actual, stored)
+
+    # The oldest slot now holds the 21st transition
+    assert reopened.get(T.tensor([0]))[0][0, 0] == 20
+
+    reopened = MemmapReplayBuffer(path)
+    fill(reopened, 1)
+
+    assert reopened.mem_cntr == 31
+
+
+def test_memmap_buffer_is_read_while_filled(tmp_path):
+    path = str(tmp_path / "buffer")
+
+    writer = MemmapReplayBuffer(path, max_size=50, input_dims=[5])
+    reader = MemmapReplayBuffer(path, readonly=True)
+
+    fill(writer, 10)
+
+    assert reader.mem_cntr == 10
+    assert T.equal(reader.get(T.arange(10))[2], writer.get(T.arange(10))[2])
+
+
+def test_memmap_buffer_checks_the_layout(tmp_path):
+    path = str(tmp_path / "buffer")
+
+    with pytest.raises(FileNotFoundError):
+        MemmapReplayBuffer(path, readonly=True)
+
+    MemmapReplayBuffer(path, max_size=10, input_dims=[5])
+
+    with pytest.raises(ValueError):
+        MemmapReplayBuffer(path, input_dims=[4])
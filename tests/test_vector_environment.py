@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from environment.constants import *
+from environment.environment import Environment
+from environment.vector_environment import VectorEnvironment
+
+N = 8
+
+
+def configure(curriculum):
+    curriculum.enable_turn()
+    curriculum.enable_random_starting_rotation()
+    curriculum.enable_x_velocity_reward()
+    curriculum.enable_landing_target()
+    curriculum.set_random_height(1, 10)
+
+
+def fly(seed, **kwargs):
+    """!
+    Flies N scalar environments and a VectorEnvironment started
+    from their states with the same random actions.
+
+    @return float: largest difference of the observations and rewards
+    """
+
+    envs = [Environment(**kwargs) for _ in range(N)]
+    for i, env in enumerate(envs):
+        configure(env.curriculum)
+        env.reset(seed=seed * 100 + i)
+
+    vector_env = VectorEnvironment(N, auto_reset=False, **kwargs)
+    configure(vector_env.curriculum)
+    vector_env.restore_state_snapshot(np.stack([env.get_state_snapshot().state for env in envs]))
+
+    rng = np.random.default_rng(seed)
+    done = np.zeros(N, dtype=bool)
+    error = 0
+
+    while not done.all():
+        actions = rng.integers(4, size=N)
+        repeat = int(rng.integers(1, 4))
+
+        observations, rewards, dones, _ = vector_env.step(actions, repeat=repeat)
+
+        for i, env in enumerate(envs):
+            if done[i]:
+                continue
+
+            observation, reward, done[i], _ = env.step(int(actions[i]), repeat=repeat)
+
+            assert dones[i] == done[i]
+            error = max(error, np.abs(observation - observations[i]).max(), abs(reward - rewards[i]))
+
+    return error
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_trajectories_match_environment(seed):
+    assert fly(seed) == 0
+
+
+@pytest.mark.parametrize("dt, substeps, integrator", [(0.1, 3, Integrator.SEMI_IMPLICIT_EULER),
+                                                      (0.1, 2, Integrator.RK4)])
+def test_trajectories_match_environment_with_other_physics(dt, substeps, integrator):
+    assert fly(0, dt=dt, substeps=substeps, integrator=integrator) == 0
+
+
+def test_finished_rockets_are_reset():
+    env = VectorEnvironment(N)
+    env.reset(seed=0)
+
+    while True:
+        observations, _, dones, info = env.step(np.full(N, Action.NOTHING))
+        if dones.any():
+            break
+
+    assert (info["final_observation"][dones, 0] <= 0).all()
+    assert (observations[dones, 0] > 0).all()
+
+
+def test_seeded_resets_are_reproducible():
+    envs = [VectorEnvironment(N), VectorEnvironment(N)]
+    for env in envs:
+        configure(env.curriculum)
+
+    observations = [np.concatenate([env.reset(seed=7), env.reset()]) for env in envs]
+
+    np.testing.assert_array_equal(observations[0], observations[1])
+
+
+def test_empty_reset_mask():
+    env = VectorEnvironment(N)
+    configure(env.curriculum)
+    env.curriculum.enable_increasing_height()
+    observations = env.reset(seed=0)
+    maximum = env.curriculum.max
+
+    np.testing.assert_array_equal(env.reset(mask=np.zeros(N, dtype=bool)), observations)
+    assert env.curriculum.max == maximum
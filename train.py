@@ -1,29 +1,69 @@
 import environment.constants
 from environment.constants import *
-from environment.dashboard import Dashboard
 import math
-import matplotlib.pyplot as plt
 import numpy as np
 import torch
 import argparse
+import functools
 
 from environment.environment import Environment
+from environment.pool import EnvironmentPool
+from environment.recorder import Recorder
+from environment.viewer import Viewer
 from network import Agent
+from learner import AsyncLearner
+from distributed import ActorLearner
+from checkpoint import Checkpointer
 
 
-def train(curriculum, softmax, save_progress, model=None):
-    dash = Dashboard()
+def configure_environment(env, curriculum, pretrained):
+    """!
+    Sets up the environment's curriculum for training.
+
+    @param env (Environment): Environment to configure
+    @param curriculum (bool): Whether Curriculum Learning is used
+    @param pretrained (bool): Whether a pretrained model is loaded
+
+    @return Environment: configured environment
+    """
 
-    # Setting up the environment
-    env = Environment()
     env.curriculum.enable_turn()
     env.curriculum.enable_random_starting_rotation()
     env.curriculum.enable_x_velocity_reward()
 
-    if not curriculum:
+    if not curriculum or pretrained:
         env.curriculum.set_random_height(1, 10)
         env.curriculum.enable_increasing_height()
 
+    return env
+
+
+def make_environment(curriculum, pretrained):
+    """!
+    Constructs an environment set up for training.
+
+    @param curriculum (bool): Whether Curriculum Learning is used
+    @param pretrained (bool): Whether a pretrained model is loaded
+
+    @return Environment: configured environment
+    """
+
+    return configure_environment(Environment(log_level=LogLevel.OFF), curriculum, pretrained)
+
+
+def make_agent(softmax, model=None, prioritized=False, max_mem_size=25000, replay=None):
+    """!
+    Constructs the agent.
+
+    @param softmax (bool): Whether Softmax exploration is used instead of eps-greedy
+    @param model (string): Path to the model to load
+    @param prioritized (bool): Whether prioritized experience replay is used
+    @param max_mem_size (int): Size of the memory replay buffer
+    @param replay (string): Directory of a replay buffer kept on the disk, reopened if it exists
+
+    @return Agent: agent to train
+    """
+
     if softmax:
         exploration = Exploration.SOFTMAX
         exploration_dec = TEMP_DECREASE
@@ -35,26 +75,87 @@ def train(curriculum, softmax, save_progress, model=None):
         exploration_min = EPS_MIN
         exploration_start = EPS_START
 
-    algorithm = "deepQ"
-
     if model is None:
         agent = Agent(gamma=0.99, epsilon=exploration_start, lr=0.001,
-                      input_dims=[5], batch_size=64, n_actions=4, exploration_dec=exploration_dec, exploration_min=exploration_min, exploration=exploration)
+                      input_dims=[5], batch_size=64, n_actions=4, exploration_dec=exploration_dec, exploration_min=exploration_min, exploration=exploration, prioritized=prioritized, max_mem_size=max_mem_size, replay_path=replay)
     else:
         agent = Agent(gamma=0.99, epsilon=0, lr=0.001,
-                      input_dims=[5], batch_size=64, n_actions=4, exploration_dec=exploration_dec, exploration_min=exploration_min, exploration=exploration)
+                      input_dims=[5], batch_size=64, n_actions=4, exploration_dec=exploration_dec, exploration_min=exploration_min, exploration=exploration, prioritized=prioritized, max_mem_size=max_mem_size, replay_path=replay)
         agent.q_eval.load_state_dict(torch.load(model))
 
-        env.curriculum.set_random_height(1, 10)
-        env.curriculum.enable_increasing_height()
+    return agent
+
+
+def learn(agent, learner=None):
+    """!
+    Updates the network after a transition is stored.
+
+    @param agent (Agent): Trained agent
+    @param learner (AsyncLearner): Asynchronous learner, if used
+    """
+
+    if learner is None:
+        agent.learn()
+    else:
+        learner.step()
+
+
+def state_dict(agent, learner=None):
+    """!
+    Copies the weights of the trained network for saving.
+
+    @param agent (Agent): Trained agent
+    @param learner (AsyncLearner): Asynchronous learner, if used
+
+    @return dict: state of the network
+    """
+
+    if learner is None:
+        return agent.q_eval.state_dict()
+
+    return learner.state_dict()
+
+
+def train(curriculum, softmax, save_progress, model=None, seed=None, record=False, prioritized=False, asynchronous=False, utd=1.0, memory=25000, replay=None, checkpoints=None, resume=False):
+    if save_progress:
+        # Plotting libraries are only loaded when the flight logs are saved
+        from environment.dashboard import Dashboard
+        dash = Dashboard()
+
+    if record:
+        # Episodes are encoded in the background, with the same cadence as the flight logs
+        recorder = Recorder(every=100)
+
+    viewer = None
+
+    # Setting up the environment
+    env = make_environment(curriculum, model is not None)
+
+    algorithm = "deepQ"
+
+    agent = make_agent(softmax, model, prioritized, memory, replay)
 
     scores = []
     velocities = []
     angles = []
 
+    start = 0
+
+    if checkpoints is not None:
+        # The complete state is written in the background every 100 episodes
+        checkpointer = Checkpointer(checkpoints)
+
+        if resume:
+            episode, progress = checkpointer.restore(agent, env)
+            scores, velocities, angles = progress["scores"], progress["velocities"], progress["angles"]
+            start = episode + 1
+
+    # Updates the network on a separate thread while the flights are simulated
+    learner = AsyncLearner(agent, utd) if asynchronous else None
+
     n_games = 2000
 
-    for i in range(n_games):
+    for i in range(start, n_games):
         score = 0
         done = False
 
@@ -62,25 +163,43 @@ def train(curriculum, softmax, save_progress, model=None):
             env.curriculum.set_random_height(1, 1)
             env.curriculum.enable_increasing_height()
 
-        observation = env.reset()
+        # Full flight logs are only needed for the dashboard
+        if save_progress and i % 100 == 0:
+            env.set_log_level(LogLevel.FULL)
+        else:
+            env.set_log_level(LogLevel.TERMINAL)
+
+        observation = env.reset(seed=seed if i == 0 else None)
+
+        if record and recorder.start_episode(i, env):
+            recorder.record(env)
 
         while not done:
             action = agent.choose_action(observation)
             new_observation, reward, done, info = env.step(action)
             score += reward
 
+            if record:
+                recorder.record(env)
+
             agent.store_transition(observation, action,
                                    reward, new_observation, done)
-            agent.learn()
+            learn(agent, learner)
 
             observation = new_observation
 
             if model is not None or i >= 1950:
-                env.render()
+                # Drawn by a separate process, which never slows down the training
+                if viewer is None:
+                    viewer = Viewer()
+                viewer.update(env)
+
+        if record:
+            recorder.end_episode()
 
         if save_progress and i % 100 == 0:
             dash.plot_log(env.rocket.flight_log, episode=i)
-            torch.save(agent.q_eval.state_dict(),
+            torch.save(state_dict(agent, learner),
                        f"models/model_{i}")
 
         scores.append(score)
@@ -99,6 +218,143 @@ def train(curriculum, softmax, save_progress, model=None):
         print(
             f"Episode: {i}\n\tEpsilon: {agent.epsilon}\n\tScore: {score:.2f}\n\tAverage score: {avg_score:.4f}\n\tAverage velocity: {avg_vel:.2f}\n\tAverage angle: {avg_ang:.2f}")
 
+        if checkpoints is not None and i % 100 == 0:
+            checkpointer.save(i, agent, env, {"scores": scores, "velocities": velocities, "angles": angles},
+                              lock=learner.lock if learner is not None else None)
+
+    if learner is not None:
+        learner.close()
+
+    if checkpoints is not None:
+        checkpointer.close()
+
+    if record:
+        recorder.close()
+
+    if viewer is not None:
+        viewer.close()
+
+
+def train_parallel(curriculum, softmax, save_progress, workers, num_envs, model=None, seed=None, prioritized=False, asynchronous=False, utd=1.0, memory=25000, replay=None):
+    """!
+    Trains the agent collecting experience from environments
+    running in a pool of worker processes.
+
+    @param curriculum (bool): Whether Curriculum Learning is used
+    @param softmax (bool): Whether Softmax exploration is used instead of eps-greedy
+    @param save_progress (bool): Whether models are saved every 100 episodes
+    @param workers (int): Number of worker processes
+    @param num_envs (int): Number of environments
+    @param model (string): Path to the model to load
+    @param seed (int): Seed of the environments
+    @param prioritized (bool): Whether prioritized experience replay is used
+    @param asynchronous (bool): Whether the network is updated on a separate thread
+    @param utd (float): Number of updates per collected transition of the asynchronous learner
+    @param memory (int): Size of the memory replay buffer
+    @param replay (string): Directory of a replay buffer kept on the disk, reopened if it exists
+    """
+
+    agent = make_agent(softmax, model, prioritized, memory, replay)
+    learner = AsyncLearner(agent, utd) if asynchronous else None
+
+    env_fn = functools.partial(
+        make_environment, curriculum, model is not None)
+
+    scores = []
+    velocities = []
+    angles = []
+
+    n_games = 2000
+
+    with EnvironmentPool(num_envs, workers, env_fn=env_fn) as pool:
+        observations = pool.reset(seed=seed)
+        episode_scores = np.zeros(num_envs)
+
+        i = 0
+        while i < n_games:
+            actions = agent.choose_actions(observations)
+            new_observations, rewards, dones, info = pool.step(actions)
+            episode_scores += rewards
+
+            for e in range(num_envs):
+                new_observation = info["final_observation"][e] if dones[e] else new_observations[e]
+
+                agent.store_transition(observations[e], actions[e],
+                                       rewards[e], new_observation, dones[e])
+                learn(agent, learner)
+
+                if not dones[e]:
+                    continue
+
+                if curriculum and i == 200:
+                    pool.call_curriculum("set_random_height", 1, 1)
+                    pool.call_curriculum("enable_increasing_height")
+
+                if save_progress and i % 100 == 0:
+                    torch.save(state_dict(agent, learner),
+                               f"models/model_{i}")
+
+                score = episode_scores[e]
+                episode_scores[e] = 0
+                scores.append(score)
+
+                avg_score = np.mean(scores[-100:])
+                velocity = new_observation[1]
+
+                if velocity < 0:
+                    velocities.append(velocity)
+                    angles.append(math.degrees(abs(new_observation[4])))
+
+                avg_vel = np.mean(velocities[-100:])
+                avg_ang = np.mean(angles[-100:])
+
+                print(
+                    f"Episode: {i}\n\tEpsilon: {agent.epsilon}\n\tScore: {score:.2f}\n\tAverage score: {avg_score:.4f}\n\tAverage velocity: {avg_vel:.2f}\n\tAverage angle: {avg_ang:.2f}")
+
+                i += 1
+
+            observations = new_observations
+
+    if learner is not None:
+        learner.close()
+
+
+def train_distributed(curriculum, softmax, save_progress, actors, model=None, seed=None, prioritized=False, memory=25000, replay=None):
+    """!
+    Trains the agent in the main process with experience collected
+    by actor processes, each exploring at its own rate.
+
+    @param curriculum (bool): Whether Curriculum Learning is used
+    @param softmax (bool): Whether Softmax exploration is used instead of eps-greedy
+    @param save_progress (bool): Whether models are saved every 100 episodes
+    @param actors (int): Number of actor processes
+    @param model (string): Path to the model to load
+    @param seed (int): Seed of the actors
+    @param prioritized (bool): Whether prioritized experience replay is used
+    @param memory (int): Size of the memory replay buffer
+    @param replay (string): Directory of a replay buffer kept on the disk, reopened if it exists
+    """
+
+    agent = make_agent(softmax, model, prioritized, memory, replay)
+
+    # Actors only choose actions, so they need no replay buffer
+    agent_fn = functools.partial(make_agent, softmax, model, max_mem_size=1)
+    env_fn = functools.partial(
+        make_environment, curriculum, model is not None)
+
+    n_games = 2000
+
+    with ActorLearner(agent, agent_fn, env_fn, actors, seed=seed) as actor_learner:
+        def on_episode(i, score):
+            if curriculum and i == 200:
+                actor_learner.call_curriculum("set_random_height", 1, 1)
+                actor_learner.call_curriculum("enable_increasing_height")
+
+            if save_progress and i % 100 == 0:
+                torch.save(agent.q_eval.state_dict(), f"models/model_{i}")
+
+        actor_learner.train(n_games, on_episode=on_episode)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -110,9 +366,53 @@ if __name__ == "__main__":
                         help="Use Softmax exploration instead of eps-greedy")
     parser.add_argument('--save', action='store_true',
                         help="Save flight logs and models every 100 episodes")
+    parser.add_argument('--prioritized', action='store_true',
+                        help="Replay transitions proportionally to their TD errors")
+    parser.add_argument('--asynchronous', action='store_true',
+                        help="Update the network on a separate thread while experience is collected")
+    parser.add_argument('--record', action='store_true',
+                        help="Record every 100th episode to logs/videos in the background")
     parser.add_argument('-model',
                         help="Path to the model to load. Overrides the curriculum and exploration settings. Renders the scene from the start.")
 
+    parser.add_argument('-memory', type=int, default=25000,
+                        help="Number of transitions kept in the replay buffer")
+    parser.add_argument('-replay',
+                        help="Directory of a memory-mapped replay buffer kept on the disk. An existing one is reopened, keeping its size.")
+
+    parser.add_argument('-checkpoints',
+                        help="Directory the complete training state is saved to every 100 episodes")
+    parser.add_argument('--resume', action='store_true',
+                        help="Resume the training from the newest checkpoint in the -checkpoints directory")
+
+    parser.add_argument('-workers', type=int, default=1,
+                        help="Number of processes collecting experience. Flight logs are not saved when more than one is used.")
+    parser.add_argument('-envs', type=int,
+                        help="Number of environments shared by the workers. Defaults to the number of workers.")
+
+    parser.add_argument('-actors', type=int,
+                        help="Number of actor processes collecting experience for a learner in the main process")
+
+    parser.add_argument('-seed', type=int,
+                        help="Seed of the environments")
+    parser.add_argument('-utd', type=float, default=1.0,
+                        help="Updates per collected transition of the asynchronous learner")
+
     args = parser.parse_args()
 
-    train(args.curriculum, args.softmax, args.save, args.model)
+    if args.resume and args.checkpoints is None:
+        parser.error("--resume requires -checkpoints")
+    if args.checkpoints is not None and (args.actors or args.workers > 1):
+        parser.error("checkpoints are only saved by the single-process training")
+
+    if args.actors:
+        train_distributed(args.curriculum, args.softmax, args.save,
+                          args.actors, args.model, args.seed, args.prioritized, args.memory, args.replay)
+    elif args.workers > 1:
+        train_parallel(args.curriculum, args.softmax, args.save,
+                       args.workers, args.envs or args.workers, args.model, args.seed, args.prioritized,
+                       args.asynchronous, args.utd, args.memory, args.replay)
+    else:
+        train(args.curriculum, args.softmax, args.save,
+              args.model, args.seed, args.record, args.prioritized, args.asynchronous, args.utd,
+              args.memory, args.replay, args.checkpoints, args.resume)